@@ -0,0 +1,48 @@
+import pygame
+from collections import OrderedDict
+
+
+class AssetManager:
+    """
+    Loads every image from disk once and keeps scaled copies of it around.
+    Scaled sizes are rounded to SIZE_STEP pixels so slowly growing sprites
+    share a handful of variants instead of one per pixel of growth
+    """
+    SIZE_STEP = 2
+    MAX_SCALED_IMAGES = 256
+
+    def __init__(self):
+        self.images = {}  # path -> decoded surface
+        self.unconverted_paths = set()  # loaded before there was a display to convert them for
+        self.scaled_images = OrderedDict()  # (path, w, h) -> scaled surface, least recently used first
+
+    def get_image(self, path: str) -> pygame.Surface:
+        if path not in self.images:
+            self.images[path] = pygame.image.load(path)
+            self.unconverted_paths.add(path)
+        # convert_alpha needs a display, images loaded before there is one get converted once it exists
+        if path in self.unconverted_paths and pygame.display.get_surface():
+            self.images[path] = self.images[path].convert_alpha()
+            self.unconverted_paths.discard(path)
+            for key in [key for key in self.scaled_images if key[0] == path]:
+                del self.scaled_images[key]  # scaled from the unconverted image
+        return self.images[path]
+
+    def get_quantized_size(self, size) -> tuple[int, int]:
+        return tuple(max(self.SIZE_STEP, int(round(s / self.SIZE_STEP)) * self.SIZE_STEP) for s in size)
+
+    def get_scaled_image(self, path: str, size) -> pygame.Surface:
+        key = (path, *self.get_quantized_size(size))
+        image = self.get_image(path)
+        if key in self.scaled_images:
+            self.scaled_images.move_to_end(key)
+            return self.scaled_images[key]
+
+        scaled_image = pygame.transform.scale(image, key[1:])
+        self.scaled_images[key] = scaled_image
+        if len(self.scaled_images) > self.MAX_SCALED_IMAGES:
+            self.scaled_images.popitem(last=False)
+        return scaled_image
+
+
+asset_manager = AssetManager()
@@ -0,0 +1,102 @@
+import os
+import sys
+import random
+import timeit
+from collections import Counter
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # no window needed to benchmark
+import pygame
+import ptext
+from world import TileMap, Camera, TILE_KEYS
+
+
+def bench_chunk_generation(chunks: int = 200, seed: int = 1234) -> None:
+    """
+    Times the numpy chunk generator against the original tile by tile one,
+    and compares how often each tile shows up in both
+    """
+    tile_map = TileMap(Camera(1200, 700, 1_000_000, 1_000_000), seed, chunk_store_path=':memory:')
+    chunk_coords = [(x, y) for x in range(20) for y in range(chunks // 20)]
+
+    per_tile_counts, array_counts = Counter(), Counter()
+
+    def run_per_tile():
+        for chunk_x, chunk_y in chunk_coords:
+            for row in tile_map.generate_chunk_per_tile(chunk_x, chunk_y):
+                per_tile_counts.update(row)
+
+    def run_array():
+        for chunk_x, chunk_y in chunk_coords:
+            ids = tile_map.generate_chunk_array(chunk_x, chunk_y)
+            array_counts.update(TILE_KEYS[tile_id] for tile_id in ids.ravel().tolist())
+
+    per_tile_time = timeit.timeit(run_per_tile, number=1)
+    array_time = timeit.timeit(run_array, number=1)
+
+    print(f'{len(chunk_coords)} chunks')
+    print(f'per tile: {per_tile_time * 1000 / len(chunk_coords):.3f} ms/chunk')
+    print(f'numpy:    {array_time * 1000 / len(chunk_coords):.3f} ms/chunk ({per_tile_time / array_time:.1f}x)')
+    total = sum(per_tile_counts.values())
+    for tile in TILE_KEYS:
+        print(f'{tile:>2}: per tile {per_tile_counts[tile] / total:.3f}  numpy {array_counts[tile] / total:.3f}')
+    tile_map.close()
+
+
+def report_chunk_memory(seed: int = 1234) -> None:
+    """
+    Compares one chunk stored as the old list of lists of tile key strings
+    with the uint8 tile id array TileMap keeps now
+    """
+    tile_map = TileMap(Camera(1200, 700, 1_000_000, 1_000_000), seed, chunk_store_path=':memory:')
+    tile_ids = tile_map.generate_chunk_array(0, 0)
+    tile_map.close()
+    as_strings = [[TILE_KEYS[tile_id] for tile_id in row] for row in tile_ids.tolist()]
+
+    # tile key strings are interned and shared, so only the lists are counted
+    list_bytes = sys.getsizeof(as_strings) + sum(sys.getsizeof(row) for row in as_strings)
+    array_bytes = sys.getsizeof(tile_ids.copy())  # a copy owns its buffer, so getsizeof counts it
+    print(f'list of strings: {list_bytes} bytes/chunk')
+    print(f'uint8 array:     {array_bytes} bytes/chunk ({tile_ids.nbytes} bytes of tiles)')
+    print(f'saved:           {list_bytes - array_bytes} bytes/chunk')
+
+
+def bench_text_wrapping(paragraphs: int = 20, words: int = 150, seed: int = 1234) -> None:
+    """
+    Times ptext line breaking on long multi paragraph text, the binary search _breaktext
+    against the original character by character scan, and checks both wrap the same way
+    """
+    rng = random.Random(seed)
+    vocabulary = ['plant', 'seed', 'soil', 'water', 'harvest', 'coins', 'trader', 'rare', 'grow', 'AVAWAY',
+                  'well-watered', 'a', 'of', 'the', 'garden', 'Tomato', 'legendary', 'mud,', 'sprouting.']
+    text = '\n'.join(' '.join(rng.choice(vocabulary) for _ in range(words)) for _ in range(paragraphs))
+    font_path = os.path.join('assets', 'fonts', 'WorkSans-Regular.ttf')
+    widths = (300, 800, 1600)
+
+    def wrap_all():
+        # cold caches every run, like text that hasn't been shown before
+        ptext._width_cache.clear()
+        ptext._glyph_advances.clear()
+        return [[(span.text, span.jline) for span in ptext._wrap(text, fontname=font_path, fontsize=20, width=width)]
+                for width in widths]
+
+    search_time = timeit.timeit(wrap_all, number=3) / 3
+    search_lines = wrap_all()
+    breaktext = ptext._breaktext
+    ptext._breaktext = ptext._breaktext_scan
+    try:
+        scan_time = timeit.timeit(wrap_all, number=3) / 3
+        scan_lines = wrap_all()
+    finally:
+        ptext._breaktext = breaktext
+
+    print(f'{paragraphs} paragraphs of {words} words at widths {widths}')
+    print(f'scan:          {scan_time * 1000:.1f} ms')
+    print(f'binary search: {search_time * 1000:.1f} ms ({scan_time / search_time:.1f}x)')
+    print(f'same lines:    {search_lines == scan_lines}')
+
+
+if __name__ == '__main__':
+    pygame.init()
+    bench_chunk_generation()
+    report_chunk_memory()
+    bench_text_wrapping()
@@ -0,0 +1,78 @@
+"""
+Runs the game without a window or sound for a fixed number of frames and prints
+p50/p99 frame times per subsystem.
+    python headless.py --frames 600 --plants 200 --npcs 20 --chunk-crossings 4
+"""
+import os
+
+# SDL picks its drivers when pygame initializes, so these have to be set before importing the game
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import argparse
+import random
+import tempfile
+import pygame
+import player
+from main import Game
+from npc import TradingNPC
+from plants import NonFruitingPlant
+from world import TileMap
+
+
+def spawn_plants(ply, amount: int, rng: random.Random) -> list[NonFruitingPlant]:
+    plants = []
+    for _ in range(amount):
+        plant = NonFruitingPlant(1, ply)
+        plant.rect.center = (ply.pos.x + rng.uniform(-1500, 1500), ply.pos.y + rng.uniform(-1000, 1000))
+        plants.append(plant)
+    return plants
+
+
+def spawn_npcs(ply, amount: int, rng: random.Random) -> list[TradingNPC]:
+    return [
+        TradingNPC(f'NPC {i}', ply.pos + (rng.uniform(-1500, 1500), rng.uniform(-1000, 1000)),
+                   None, (100, 100), 200, rng.random())
+        for i in range(amount)
+    ]
+
+
+def run(frames: int, plants: int, npcs: int, chunk_crossings: int, dirty_rects: bool, seed: int,
+        cprofile_path: str = None) -> Game:
+    rng = random.Random(seed)
+    save_dir = tempfile.mkdtemp(prefix='headless-')
+
+    ply = player.Player((650, 1300), data_path=os.path.join(save_dir, 'player_data.json'))  # never touch the real save
+
+    game = Game(*spawn_npcs(ply, npcs, rng), *spawn_plants(ply, plants, rng), player=ply,
+                dirty_rects=dirty_rects, profile=True, chunk_store_path=':memory:', world_seed=seed)
+    game.set_up()
+
+    # scripted input: walk in a straight line so the camera crosses `chunk_crossings` chunk borders
+    chunk_width = TileMap.CHUNK_WIDTH * TileMap.TILE_SIZE
+    step = pygame.Vector2(chunk_width * chunk_crossings / max(frames, 1), 0)
+    if cprofile_path:
+        game.profiler.start_capture(frames, cprofile_path)
+
+    for _ in range(frames):
+        ply.pos += step
+        game.step()
+
+    game.close()
+    return game
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless frame time benchmark')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--plants', type=int, default=100)
+    parser.add_argument('--npcs', type=int, default=10)
+    parser.add_argument('--chunk-crossings', type=int, default=2)
+    parser.add_argument('--dirty-rects', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cprofile', metavar='PATH', help='also write a cProfile of every frame to PATH')
+    args = parser.parse_args()
+
+    finished_game = run(args.frames, args.plants, args.npcs, args.chunk_crossings, args.dirty_rects, args.seed,
+                        args.cprofile)
+    print(finished_game.profiler.get_report())
@@ -0,0 +1,36 @@
+import pygame
+
+
+class InputState:
+    """
+    Mouse and keyboard state resolved once per frame, so everything that reacts to input
+    reads the same snapshot instead of polling pygame and hit-testing the inventory again.
+    Call update() once a frame after the event queue has been pumped
+    """
+    def __init__(self):
+        self.mouse_pos = (0, 0)
+        self.mouse_pressed = (False, False, False)
+        self.mouse_just_pressed = (False, False, False)
+        self.keys_pressed = None
+        self.keys_just_pressed = None
+        self.clicked_slot = None  # inventory slot left clicked this frame
+        self.clicked_item = None
+
+    def update(self, player) -> None:
+        self.mouse_pos = pygame.mouse.get_pos()
+        self.mouse_pressed = pygame.mouse.get_pressed()
+        self.mouse_just_pressed = pygame.mouse.get_just_pressed()
+        self.keys_pressed = pygame.key.get_pressed()
+        self.keys_just_pressed = pygame.key.get_just_pressed()
+
+        self.clicked_slot = None
+        self.clicked_item = None
+        if self.mouse_just_pressed[0]:
+            for idx, rect in enumerate(player.inventory_rects):
+                if rect.collidepoint(self.mouse_pos):
+                    self.clicked_slot = idx
+                    self.clicked_item = player.data.inventory[f'item{idx}']
+                    break
+
+    def get_key_just_pressed(self, key) -> bool:
+        return self.keys_just_pressed is not None and self.keys_just_pressed[key]
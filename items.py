@@ -1,44 +1,126 @@
 import sqlite3
 import os
 import json
+from bisect import bisect_right
+import numpy as np
+
+TIERING_SYSTEM_PATH = os.path.join('gamedata', 'tiering_system.json')
+MAX_RARITY_VALUE = 100  # upper bound of the last tier
+
+class PlantDB:
+    """
+    Process wide plant catalog. Every PlantDB shares one connection, and all rows are
+    read into memory the first time one is made, so looking up a plant never touches SQLite
+    """
+    _conn = None
+    _plants = {}  # id -> (id, name, seed_color, image_file, rarity)
+    _plants_by_name = {}
 
-class PlantDB:    
     def __init__(self):
-        self.conn = sqlite3.connect(os.path.join('gamedata', 'plants.db'))
+        if PlantDB._conn is None:
+            PlantDB._conn = sqlite3.connect(os.path.join('gamedata', 'plants.db'))
+            PlantDB._conn.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS items  (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT UNIQUE,
+                    seed_color TEXT,
+                    image_file TEXT,
+                    rarity TEXT
+                )
+            '''
+                                )
+            self.cache_plants(PlantDB._conn.execute('SELECT * FROM items').fetchall())
+        self.conn = PlantDB._conn
         self.cursor = self.conn.cursor()
 
-        self.cursor.execute(
-            '''
-            CREATE TABLE IF NOT EXISTS items  (
-                id INTEGER PRIMARY KEY,
-                name TEXT UNIQUE,
-                seed_color TEXT,
-                image_file TEXT,
-                rarity TEXT
-            )
-        '''
-                            )
-    
+    def cache_plants(self, rows: list[tuple]) -> None:
+        for row in rows:
+            PlantDB._plants[row[0]] = row
+            PlantDB._plants_by_name[row[1]] = row
+
     def get_all_plants(self) -> list[tuple]:
-        return self.cursor.execute('SELECT * FROM items').fetchall()
+        return list(PlantDB._plants.values())
     
-    def get_plant(self, plant_id: int) -> list[tuple]:
-        return self.cursor.execute(f'SELECT * FROM ITEMS WHERE id = {plant_id}').fetchone()
+    def get_plant(self, plant_id: int) -> tuple:
+        if plant_id not in PlantDB._plants:  # added to the database by something else since it was loaded
+            row = self.cursor.execute('SELECT * FROM items WHERE id = ?', (plant_id,)).fetchone()
+            if row is None:
+                return None
+            self.cache_plants([row])
+        return PlantDB._plants[plant_id]
+
+    def get_plant_by_name(self, name: str) -> tuple:
+        return PlantDB._plants_by_name.get(name)
     
     def add_new_plants(self, values: list[tuple]) -> None:
         """
         Add new plants into the Plant Database
         values must be (id, name, seed_color, image_file, rarity)
         """
-        self.cursor.executemany(f'INSERT INTO items VALUES (?,?,?,?,?)', values)
+        self.cursor.executemany('INSERT INTO items VALUES (?,?,?,?,?)', values)
         self.conn.commit()
+        self.cache_plants(values)
 
     def close(self):
-        self.conn.close()
+        """
+        Only releases this instance's cursor, the shared connection stays open for the next lookup
+        """
+        self.cursor.close()
         
-def get_tiering_system():
-    with open(os.path.join('gamedata', 'tiering_system.json')) as tiering_system:
-        return json.load(tiering_system)
+_tiering_cache = {
+    'mtime': None,
+    'tiers': {},  # rarity -> value the tier starts at
+    'names': [],  # rarities sorted by where they start
+    'starts': np.array([]),
+    'stops': np.array([]),
+    'index': {}  # rarity -> position in names
+}
+
+def load_tiering_system() -> dict:
+    """
+    Returns the cached tier table, only re-reading the file when it changed on disk
+    """
+    mtime = os.stat(TIERING_SYSTEM_PATH).st_mtime_ns
+    if mtime != _tiering_cache['mtime']:
+        with open(TIERING_SYSTEM_PATH) as tiering_system:
+            tiers = json.load(tiering_system)
+        names = sorted(tiers, key=tiers.get)
+        starts = [tiers[name] for name in names]
+        _tiering_cache.update({
+            'mtime': mtime,
+            'tiers': tiers,
+            'names': names,
+            'starts': np.array(starts, dtype=float),
+            'stops': np.array(starts[1:] + [MAX_RARITY_VALUE], dtype=float),
+            'index': {name: idx for idx, name in enumerate(names)}
+        })
+    return _tiering_cache
+
+def get_tiering_system() -> dict:
+    return load_tiering_system()['tiers']
+
+def get_tier_bounds(rarity: str) -> tuple[float, float]:
+    tiering = load_tiering_system()
+    idx = tiering['index'][rarity]
+    return float(tiering['starts'][idx]), float(tiering['stops'][idx])
+
+def get_rarity_for_value(rarity_value: float) -> str:
+    """
+    Binary searches the tier a rarity value falls in
+    """
+    tiering = load_tiering_system()
+    idx = max(0, bisect_right(tiering['starts'], rarity_value) - 1)
+    return tiering['names'][idx]
+
+def get_random_rarity_nums(rarities: list[str], rng=None) -> np.ndarray:
+    """
+    Rolls a rarity value for every rarity given, all in one go
+    """
+    tiering = load_tiering_system()
+    indices = np.array([tiering['index'][rarity] for rarity in rarities], dtype=int)
+    rng = rng or np.random.default_rng()
+    return rng.uniform(tiering['starts'][indices], tiering['stops'][indices])
     
 class BaseWateringTool:
     def __init__(self, power: float, watering_range: int) -> None:
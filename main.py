@@ -5,20 +5,16 @@ from items import *
 from audio import MusicPlayer
 from world import TileMap, Camera
 from npc import BaseNPC, NPCRunner, TradingNPC
+from rendering import DirtyRectRenderer
+from profiling import FrameProfiler, ProfilerOverlay
+from input_state import InputState
 #ALL SPRITES / IMAGES MADE BY NKOLA AIDEN KATAMBWA (ME)
 
 pygame.init()
 
-music_player = MusicPlayer()
-clock = pygame.time.Clock()
-ply1 = player.Player((650, 1300))
-s1 = give_seed(ply1, 1, 7)
-tr1 = TradingNPC('Tader', ply1.pos.copy(), None, (100,100), 200, 1)
-tr2 = TradingNPC('Radvier', ply1.pos.copy() + (200, 0), None, (100,100), 200, 0.5)
-tr3 = TradingNPC('Rake snake', ply1.pos.copy() + (400, 0), None, (100,100), 200, 0.1)
-
 class Game:  # easier to organize
-    def __init__(self, *all_sprites, player):
+    def __init__(self, *all_sprites, player, dirty_rects=False, music_player=None, profile=False,
+                 chunk_store_path=None, world_seed=None):
         WIDTH, HEIGHT = 1200, 700
         self.all_sprites = list(all_sprites)
         self.running = True
@@ -27,21 +23,29 @@ class Game:  # easier to organize
         self.camera = Camera(WIDTH, HEIGHT, self.WORLD_SIZE[0], self.WORLD_SIZE[1])
         self.screen_rect = pygame.Rect(0, 0, WIDTH, HEIGHT)
         self.player = player
+        self.renderer = DirtyRectRenderer() if dirty_rects else None  # only redraws / updates what changed
+        self.music_player = music_player
+        self.profiler = FrameProfiler(enabled=profile)
+        self.profiler_overlay = ProfilerOverlay(self.profiler)  # F3 to show, F4 to capture a cProfile
+        self.chunk_store_path = chunk_store_path
+        self.world_seed = world_seed  # None loads the saved world
+        self.clock = pygame.time.Clock()
+        self.input_state = InputState()  # mouse and keyboard, resolved once per frame
 
     def load_player_inventory(self):
         for idx, (slot, item) in enumerate(self.player.data.inventory.items()):
             if item:
                 if item['type'] == 'Seed':
                     self.all_sprites.append(Seed(name=item['name'],
-                                                 player=ply1,
+                                                 player=self.player,
                                                  inventory_slot=idx,
                                                  color=item['color'],
-                                                 plant_state=NonFruitingPlant(item['id'], ply1)))
+                                                 plant_state=NonFruitingPlant(item['id'], self.player)))
                 
                 if item['type'] == 'Plant':
-                    plant_to_implement = NonFruitingPlant(item['id'], ply1)
-                    plant_to_implement.inventory_rect = ply1.inventory_rects[idx]
-                    plant_to_implement.rect.center = ply1.inventory_rects[idx].center
+                    plant_to_implement = NonFruitingPlant(item['id'], self.player)
+                    plant_to_implement.inventory_rect = self.player.inventory_rects[idx]
+                    plant_to_implement.rect.center = self.player.inventory_rects[idx].center
                     plant_to_implement.picked_up = True
                     plant_to_implement.size = item['size']
                     plant_to_implement.rarity_value = item['rarity_value']
@@ -56,45 +60,97 @@ class Game:  # easier to organize
         all_npc = [sprite for sprite in self.all_sprites if isinstance(sprite, BaseNPC)]
         self.npc_runner = NPCRunner(all_npc)
 
-        self.tile_map = TileMap(self.camera)
+        self.tile_map = TileMap(self.camera, self.world_seed, chunk_store_path=self.chunk_store_path)
         #self.tile_map.drop_player(self.player, self.WORLD_SIZE)
 
-    def main(self) -> None:
-        pygame.display.set_caption('Grow a Garden')
-        music_player.play_song('morning')
-        while self.running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-
-                if event.type == pygame.VIDEORESIZE:
-                    # update screen and camera sizes
-                    self.screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
-                    self.camera.w = event.w
-                    self.camera.h = event.h
-            
-            # ORDER DICTATES SCREEN PLACEMENT ORDER
-
-            self.screen.fill('white')
-            self.tile_map.draw(self.screen, self.camera)
-            self.camera.follow(ply1)
+    def handle_events(self, events) -> None:
+        for event in events:
+            self.profiler_overlay.handle_event(event)
+            if event.type == pygame.QUIT:
+                self.running = False
+
+            if event.type == pygame.VIDEORESIZE:
+                # update screen and camera sizes
+                self.screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+                self.camera.w = event.w
+                self.camera.h = event.h
 
+    def step(self) -> None:
+        """
+        Runs a single frame, without waiting on the clock
+        """
+        profiler = self.profiler
+        profiler.begin_frame()
+        with profiler.section('events'):
+            self.handle_events(pygame.event.get())
+            self.input_state.update(self.player)
+
+        # ORDER DICTATES SCREEN PLACEMENT ORDER
+
+        with profiler.section('tile_map.draw'):
+            if self.renderer:
+                self.renderer.begin_frame(self.screen, self.camera, self.tile_map)
+            else:
+                self.screen.fill('white')
+                self.tile_map.draw(self.screen, self.camera)
+        self.camera.follow(self.player)
+
+        with profiler.section('npc_runner.draw'):
             self.npc_runner.draw(self.screen, self.camera)
-            self.npc_runner.update(self.player, self.camera)
-            
+        with profiler.section('npc_runner.update'):
+            self.npc_runner.update(self.player, self.camera, self.input_state)
+
+        with profiler.section('player.draw'):
             self.player.draw(self.screen, self.camera)
+        with profiler.section('player.update'):
             self.player.update(self.tile_map)
+        with profiler.section('player.draw_inventory'):
             self.player.draw_inventory(self.screen)
 
+        with profiler.section('plant_runner.draw'):
             self.plant_runner.draw(self.screen, self.camera)
+        with profiler.section('plant_runner.update'):
             self.plant_runner.update(self.camera, self.tile_map)
-            
-            music_player.run()
-           
-            pygame.display.update()
 
-            clock.tick(60)
+        if self.music_player:
+            self.music_player.run()
+
+        self.profiler_overlay.draw(self.screen)
+
+        with profiler.section('display.update'):
+            if self.renderer:
+                self.renderer.end_frame(self.screen, self.camera, self.player, self.npc_runner, self.plant_runner,
+                                        self.profiler_overlay)
+            else:
+                pygame.display.update()
+        profiler.end_frame()
+
+    def main(self) -> None:
+        pygame.display.set_caption('Grow a Garden')
+        if self.music_player:
+            self.music_player.play_song('morning')
+        while self.running:
+            self.step()
+            self.clock.tick(60)
+
+        self.close()
+
+    def close(self) -> None:
+        """
+        Flushes everything that's saved in the background
+        """
+        self.tile_map.close()
+        self.player.close()
+
+
+if __name__ == '__main__':
+    music_player = MusicPlayer()
+    ply1 = player.Player((650, 1300))
+    s1 = give_seed(ply1, 1, 7)
+    tr1 = TradingNPC('Tader', ply1.pos.copy(), None, (100,100), 200, 1)
+    tr2 = TradingNPC('Radvier', ply1.pos.copy() + (200, 0), None, (100,100), 200, 0.5)
+    tr3 = TradingNPC('Rake snake', ply1.pos.copy() + (400, 0), None, (100,100), 200, 0.1)
 
-game = Game(tr1, tr2, tr3, player=ply1)
-game.set_up()
-game.main() 
\ No newline at end of file
+    game = Game(tr1, tr2, tr3, player=ply1, music_player=music_player)
+    game.set_up()
+    game.main()
@@ -6,6 +6,7 @@ from random import choice
 import ptext
 import numpy as np
 from plants import screen_to_world
+from world import SpatialHash
 
 DIALOGUE_PATHS = [
     path.join('gamedata', 'npc-dialogue', 'trading_npc.json')
@@ -24,6 +25,7 @@ class DialogueBox:
         self.text = text
         self.text_to_display = ""
         self.current_index = 0
+        self.layout = None  # laid out on the first run, rendering needs the display
 
     def get_timer(self):
         return pygame.time.get_ticks() / 1000 - self._ticks >= self.letter_interval
@@ -36,11 +38,9 @@ class DialogueBox:
             
     def run(self, pos):
         self.update()
-        ptext.draw(
-            self.text_to_display,
-            pos,
-            anchor=(0.5, 1.0)
-        )
+        if self.layout is None:
+            self.layout = ptext.TypewriterLayout(self.text, anchor=(0.5, 1.0))
+        self.layout.draw(self.current_index, pos)
 
 class BaseEnemy:
     """
@@ -69,9 +69,9 @@ class BaseNPC:
         self.bias = bias
         self.dialogue_box = DialogueBox("None", None)
 
-    def get_activated(self, player_pos):
+    def get_activated(self, player_pos, input_state):
         return (self.get_in_interact_area(player_pos) 
-                and pygame.key.get_just_pressed()[self.activate_button])
+                and input_state.get_key_just_pressed(self.activate_button))
 
     def get_in_interact_area(self, other_pos):
         return self.interact_rect.collidepoint(other_pos)
@@ -83,10 +83,18 @@ class BaseNPC:
         rect_to_draw.topleft = screen_pos
         pygame.draw.rect(screen, 'gray', rect_to_draw)
 
+    def get_screen_rect(self, camera):
+        return self.rect.move(-camera.offset.x, -camera.offset.y)
 
     def update(self):
         self.interact_rect.center = self.pos
 
+    def handle_activation(self, player, camera, input_state):
+        """
+        Called by NPCRunner while the player is in the interact area, and on the frame they leave it
+        """
+        pass
+
 class TradingNPC(BaseNPC):
     def __init__(self, name, pos, image, size, interact_area_radius, bias=0.5):
         super().__init__(name, pos, image, size, interact_area_radius, bias)
@@ -132,32 +140,25 @@ class TradingNPC(BaseNPC):
             self.set_up_dialogue_box()
         #ptext.draw(self.current_dialogue, (corrected_pos[0], corrected_pos[1]))
         
-    def get_player_clicked_item(self, player):
-        for idx, rect in enumerate(player.inventory_rects):
-            if rect.collidepoint(pygame.mouse.get_pos()) and pygame.mouse.get_just_pressed()[0]:
-                return player.data.inventory[f'item{idx}']
-    
     def write_text(self, text, pos):
-        ptext.draw(text, 
-                    pos,
-                    anchor=(0.5, 1.0))
+        ptext.drawglyphs(text, pos, anchor=(0.5, 1.0))
         
-    def handle_activation(self, player, camera):
+    def handle_activation(self, player, camera, input_state):
         corrected_pos = (self.pos[0] - camera.offset.x, self.pos[1] - camera.offset.y-100)
         if self.activated == False:
             self.clicked_item = None
 
-        if (self.clicked_item != self.get_player_clicked_item(player) 
-            and self.get_player_clicked_item(player) is not None):  # if there is a new item clicked
+        clicked_item = input_state.clicked_item
+        if self.clicked_item != clicked_item and clicked_item is not None:  # if there is a new item clicked
             self.current_dialogue = None  # reset the dialogue
-            self.clicked_item = self.get_player_clicked_item(player)  # replace item with new item
+            self.clicked_item = clicked_item  # replace item with new item
 
         # if player presses activate button again, disable npc
-        if self.activated and pygame.key.get_just_pressed()[self.activate_button]:
+        if self.activated and input_state.get_key_just_pressed(self.activate_button):
             self.activated = False
             return
         
-        if self.get_activated(player.pos) or self.activated:
+        if self.get_activated(player.pos, input_state) or self.activated:
             self.activated = True  # once activated, always activated unless changed
             if self.clicked_item:  # if clicked item is not None
                 self.inspect_item(self.clicked_item)
@@ -183,17 +184,49 @@ class TradingNPC(BaseNPC):
         
         self.rect.center = self.pos
         self.interact_rect.center = self.pos
-        self.handle_activation(player, camera)
        
 
 class NPCRunner:
+    FAR_UPDATE_INTERVAL = 30  # frames between updates of characters outside the camera view
+    VIEW_MARGIN = 150  # room for the name and dialogue drawn above a character
+
     def __init__(self, characters: list[BaseNPC]):
         self.characters = characters
+        self.spatial_hash = SpatialHash()
+        for c in characters:
+            self.spatial_hash.insert(c, *c.pos)
+        self.drawn_characters = []
+        self.frame = 0
+        # anything closer than this to the player may have them in its interact area
+        self.interact_query_size = 2 * max((c.interact_area_radius for c in characters), default=0)
+        self.interacting_characters = []
+
+    def get_visible_characters(self, camera) -> list[BaseNPC]:
+        view_rect = camera.get_world_rect(self.VIEW_MARGIN)
+        return [c for c in self.spatial_hash.query_rect(view_rect) if view_rect.colliderect(c.rect)]
     
+    def get_characters_in_interact_area(self, pos) -> list[BaseNPC]:
+        query_rect = pygame.Rect(0, 0, self.interact_query_size, self.interact_query_size)
+        query_rect.center = pos
+        return [c for c in self.spatial_hash.query_rect(query_rect) if c.get_in_interact_area(pos)]
+
     def draw(self, screen, camera):
-        for c in self.characters:
+        self.drawn_characters = self.get_visible_characters(camera)
+        for c in self.drawn_characters:
             c.draw(screen, camera)
     
-    def update(self, player, camera):
-        for c in self.characters:
-            c.update(player, camera)
\ No newline at end of file
+    def update(self, player, camera, input_state):
+        self.frame += 1
+        view_rect = camera.get_world_rect(self.VIEW_MARGIN)
+        for c in self.spatial_hash.get_objects_to_update(view_rect, self.frame, self.FAR_UPDATE_INTERVAL):
+            c.update(player, camera)
+            self.spatial_hash.move(c, *c.pos)
+
+        # only characters the player is next to react to input, plus the ones they just walked away from
+        interacting = self.get_characters_in_interact_area(player.pos)
+        for c in dict.fromkeys(interacting + self.interacting_characters):
+            c.handle_activation(player, camera, input_state)
+        self.interacting_characters = interacting
+
+    def get_screen_rects(self, camera):
+        return [c.get_screen_rect(camera) for c in self.drawn_characters]
@@ -2,8 +2,11 @@ import pygame
 import ptext
 import random
 import os
+import math
 import numpy as np
-from items import get_tiering_system, PlantDB
+from items import get_tier_bounds, PlantDB
+from world import SpatialHash
+from asset_manager import asset_manager
 
 def screen_to_world(pos, camera):
     return (pos[0] + camera.offset.x,
@@ -11,8 +14,6 @@ def screen_to_world(pos, camera):
 
 plant_database = PlantDB()
 #plant_database.add_new_plants([(1, 'Carrot', 'orange', 'carrot.png', 'plain')])
-print(plant_database.get_all_plants())
-plant_database.close()
 
 class Seed:
     def __init__(self, name: str, player, inventory_slot: int, color: str, plant_state = None):
@@ -83,14 +84,15 @@ class Seed:
             return False
         
         world_pos = screen_to_world(self.rect.center, camera)
-        if tile_map.get_tile_at(world_pos[0], world_pos[1]) == 'S':
-            return True
-
-        return False
+        _, terrain = tile_map.get_terrain_at(world_pos[0], world_pos[1])
+        return terrain.can_plant
     
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
 
+    def get_screen_rect(self, camera):
+        return self.rect.copy()  # seeds only ever live in screen space
+
     def update(self, tile_map, camera):
         if self.just_dragged and not self.dragged:
             self.just_dragged = False
@@ -116,10 +118,157 @@ class Seed:
             slot_center = self.player.inventory_rects[self.inventory_slot].center
             self.rect.center = slot_center
 
+def get_growth_ticks_until_done(size, max_size, growing_increments):
+    """
+    How many growing ticks a plant has left before it stops growing, None if it never stops.
+    Every tick each axis below its max grows by its increment, and growing stops after the first tick
+    where size + increments goes over max_size summed over both axes, see BasePlant.grow
+    """
+    size_left = sum(max_size) - sum(growing_increments) - sum(size)  # has to go below 0 to stop
+    # ticks until each axis reaches its own max and stops adding to the sum
+    axis_ticks = [math.ceil((m - s) / i) if i > 0 and s < m else 0
+                  for s, m, i in zip(size, max_size, growing_increments)]
+    rate = sum(i for i, ticks in zip(growing_increments, axis_ticks) if ticks > 0)
+    ticks_done = 0
+    for axis_end in sorted(set(ticks for ticks in axis_ticks if ticks > 0)):
+        # between ticks_done and axis_end the summed size grows by `rate` every tick
+        ticks = ticks_done + max(1, int(size_left // rate) + 1)
+        if ticks <= axis_end:
+            return ticks
+        size_left -= rate * (axis_end - ticks_done)
+        ticks_done = axis_end
+        rate -= sum(i for i, t in zip(growing_increments, axis_ticks) if t == axis_end)
+    return None
+
+
+class FieldAttribute:
+    """
+    Plant attribute that lives in the plant's PlantField while it's planted
+    and on the plant itself otherwise
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.private_name = '_' + name
+
+    def __get__(self, plant, owner=None):
+        if plant is None:
+            return self
+        if plant.field is None:
+            return getattr(plant, self.private_name)
+        return plant.field.get_value(self.name, plant.field_index)
+
+    def __set__(self, plant, value):
+        if plant.field is None:
+            setattr(plant, self.private_name, value)
+        else:
+            plant.field.set_value(self.name, plant.field_index, value)
+
+
+class PlantField:
+    """
+    Growth state of every planted plant kept in contiguous numpy arrays, one row per plant,
+    so the whole field grows with one vectorized step per tick instead of a grow() call per plant
+    """
+    ATTRIBUTES = ('size', 'max_size', 'growing_increments', 'growing_time', 'growing_clock',
+                  'times_grown', 'rarity_value')
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.size = np.zeros((capacity, 2))
+        self.max_size = np.zeros((capacity, 2))
+        self.growing_increments = np.zeros((capacity, 2))
+        self.growing = np.zeros(capacity, dtype=bool)  # False once growing_increments became 0, or for free rows
+        self.growing_time = np.zeros(capacity)
+        self.growing_clock = np.zeros(capacity)
+        self.times_grown = np.zeros(capacity, dtype=np.int64)
+        self.rarity_value = np.zeros(capacity)
+        self.plants = [None] * capacity
+        self.free_rows = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return self.capacity - len(self.free_rows)
+
+    def grow_capacity(self) -> None:
+        new_capacity = self.capacity * 2
+        for name in ('size', 'max_size', 'growing_increments', 'growing', 'growing_time',
+                     'growing_clock', 'times_grown', 'rarity_value'):
+            old = getattr(self, name)
+            new = np.zeros((new_capacity, *old.shape[1:]), dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.plants += [None] * (new_capacity - self.capacity)
+        self.free_rows += list(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def get_value(self, name, row):
+        if name == 'growing_increments':
+            return tuple(self.growing_increments[row]) if self.growing[row] else 0
+        if name in ('size', 'max_size'):
+            return getattr(self, name)[row]  # a view, so item assignment writes into the field
+        if name == 'times_grown':
+            return int(self.times_grown[row])
+        return float(getattr(self, name)[row])
+
+    def set_value(self, name, row, value) -> None:
+        if name == 'growing_increments':
+            self.growing[row] = not isinstance(value, int)  # growing_increments = 0 means done growing
+            if self.growing[row]:
+                self.growing_increments[row] = value
+            return
+        getattr(self, name)[row] = value
+
+    def add(self, plant) -> None:
+        if not self.free_rows:
+            self.grow_capacity()
+        row = self.free_rows.pop()
+        values = {name: getattr(plant, name) for name in self.ATTRIBUTES}
+        self.plants[row] = plant
+        plant.field, plant.field_index = self, row
+        for name, value in values.items():
+            self.set_value(name, row, value)
+
+    def remove(self, plant) -> None:
+        row = plant.field_index
+        values = {name: getattr(plant, name) for name in self.ATTRIBUTES}
+        values['size'] = values['size'].copy()
+        values['max_size'] = values['max_size'].copy()
+        plant.field, plant.field_index = None, None
+        for name, value in values.items():
+            setattr(plant, name, value)
+        self.plants[row] = None
+        self.growing[row] = False
+        self.free_rows.append(row)
+
+    def step(self, now: float) -> None:
+        """
+        Same rules as BasePlant.grow, applied to every plant in the field at once
+        """
+        due = self.growing & (self.growing_time <= now - self.growing_clock)
+        self.growing_clock[due] = now  # resets clocks
+
+        can_grow = (due & (self.times_grown >= 1))[:, np.newaxis] & (self.size < self.max_size)
+        self.size += np.where(can_grow, self.growing_increments, 0)
+        self.times_grown[due] += 1
+
+        # do not grow if you'll go over the max size
+        too_big = self.size.sum(axis=1) + self.growing_increments.sum(axis=1) > self.max_size.sum(axis=1)
+        self.growing &= ~too_big
+
+
 class BasePlant: 
+    size = FieldAttribute()
+    max_size = FieldAttribute()
+    growing_increments = FieldAttribute()
+    growing_time = FieldAttribute()
+    growing_clock = FieldAttribute()
+    times_grown = FieldAttribute()
+    rarity_value = FieldAttribute()
+
     def __init__(self, name: str, pos: tuple[int, int], color: str, size: tuple[int,int], 
                  growing_time: float, growing_increments: tuple[float, float], player, 
                  max_size: tuple[int, int] = None, rarity: str = 'ordinary'):
+        self.field = None  # set while the plant is planted and grown by a PlantField
+        self.field_index = None
         self.name = name
         self.rect = pygame.Rect(pos[0], pos[1], size[0], size[1])
         self.pos = pos
@@ -151,14 +300,7 @@ class BasePlant:
         return self.rect.collidepoint(screen_to_world(pygame.mouse.get_pos(), camera)) if not self.picked_up else self.inventory_rect.collidepoint(pygame.mouse.get_pos())
     
     def get_random_rarity_num(self):
-        start = None
-        for rarity, val in get_tiering_system().items():
-            if start is not None:
-                stop = val
-                break
-            if rarity == self.rarity:
-                start = val
-        return random.uniform(start, stop) if self.rarity != 'intangible' else random.uniform(95, 100)
+        return random.uniform(*get_tier_bounds(self.rarity))
     
     def get_growing_time_passed(self) -> None:
         return self.growing_time <= pygame.time.get_ticks()/1000 - self.growing_clock
@@ -166,18 +308,51 @@ class BasePlant:
     def get_clicked_on(self, camera):
         return self.rect.collidepoint(screen_to_world(pygame.mouse.get_pos(), camera)) and pygame.mouse.get_pressed()[0]
     
+    def advance_to(self, now: float) -> None:
+        """
+        Applies every growing tick due between growing_clock and `now` in one go, so a plant
+        that wasn't updated for a while (far away, just loaded) catches up in O(1)
+        Ticks land every growing_time seconds from the clock, without the frame rate drift grow() has
+        """
+        if isinstance(self.growing_increments, int) or self.growing_time <= 0:
+            return self.grow()
+
+        ticks = int((now - self.growing_clock) // self.growing_time)
+        if ticks <= 0:
+            return
+        if sum(self.size) + sum(self.growing_increments) > sum(self.max_size):
+            ticks = 1  # grow() stops after the next tick, even if it's a warm up tick that doesn't grow
+        # the first ticks only count up times_grown, see grow
+        warm_up_ticks = min(ticks, max(0, 1 - self.times_grown))
+        growth_ticks = ticks - warm_up_ticks
+        if growth_ticks:
+            increments = self.growing_increments
+            ticks_until_done = get_growth_ticks_until_done(self.size, self.max_size, increments)
+            if ticks_until_done is not None:
+                growth_ticks = min(growth_ticks, ticks_until_done)
+            size = np.array(self.size, dtype=float)
+            max_size = self.max_size
+            for axis in range(2):
+                if increments[axis] > 0 and size[axis] < max_size[axis]:
+                    axis_ticks = math.ceil((max_size[axis] - size[axis]) / increments[axis])
+                    size[axis] += increments[axis] * min(growth_ticks, axis_ticks)
+            self.size = size
+
+        self.times_grown += warm_up_ticks + growth_ticks
+        self.growing_clock += (warm_up_ticks + growth_ticks) * self.growing_time
+        if sum(self.size) + sum(self.growing_increments) > sum(self.max_size):
+            self.growing_increments = 0
+
     def grow(self) -> None:
+        """
+        Grows a plant by one tick if it's due, plants in a PlantField are grown by PlantField.step instead
+        """
         if self.get_growing_time_passed() and not isinstance(self.growing_increments, int):
             self.growing_clock = pygame.time.get_ticks()/1000  # resets clock
             if self.times_grown >= 1:
                 self.size[0] = self.size[0] + self.growing_increments[0] if self.size[0] < self.max_size[0] else self.size[0]
                 self.size[1] = self.size[1] + self.growing_increments[1] if self.size[1] < self.max_size[1] else self.size[1]
             self.times_grown += 1
-            print(self.name)
-            print(self.times_grown)
-            print(self.rarity_value)
-            print(self.times_grown/(self.rarity_value*5))
-            print('*********************')
         if (np.sum(self.size) + np.sum(self.growing_increments)) > np.sum(self.max_size): # do not grow if you'll go over the max size
             self.growing_increments = 0
 
@@ -248,9 +423,15 @@ class BasePlant:
         if self.get_mouse_hover(camera):
             self.display_info()
 
+    def get_screen_rect(self, camera):
+        if self.picked_up:  # centered in the inventory slot, which is already screen space
+            return self.rect.copy()
+        return self.rect.move(-camera.offset.x, -camera.offset.y)
+
     def update(self, camera) -> None:
         if not self.picked_up: 
-            self.grow()
+            if self.field is None:
+                self.advance_to(pygame.time.get_ticks() / 1000)
             center = self.rect.center
             self.rect.size = self.size[0], self.size[1]
             self.rect.center = center
@@ -263,10 +444,10 @@ class BasePlant:
 class NonFruitingPlant(BasePlant):
     def __init__(self, id, player, max_size = None):
         self.id = id
-        plant_database = PlantDB()
         self.plant_data = plant_database.get_plant(self.id)
-        plant_database.close()
-        self.image = pygame.transform.scale(pygame.image.load(os.path.join('assets', 'images', 'plants', self.plant_data[3])), (10,10))
+        self.image_path = os.path.join('assets', 'images', 'plants', self.plant_data[3])
+        self.image = asset_manager.get_scaled_image(self.image_path, (10,10))
+        self.image_size = (10, 10)
         super().__init__(self.plant_data[1], (0,0), self.plant_data[2], (16,16), 0, (1,1), player, max_size, self.plant_data[-1])
     
 
@@ -310,41 +491,148 @@ class NonFruitingPlant(BasePlant):
         }
 
     def update(self, camera):
-        self.image = pygame.transform.scale(pygame.image.load(os.path.join('assets', 'images', 'plants', self.plant_data[3])), self.size)
+        size = (self.size[0], self.size[1])
+        if size != self.image_size:  # only rescale once the plant actually grew
+            self.image = asset_manager.get_scaled_image(self.image_path, size)
+            self.image_size = size
         return super().update(camera)
     
 class PlantRunner:
+    """
+    Runs every seed and plant. Objects are stored by id so adding and removing them is O(1),
+    and changes made while updating are queued and applied once the frame's updates are done
+    """
+    FAR_UPDATE_INTERVAL = 30  # frames between updates of plants outside the camera view
+    VIEW_MARGIN = 100  # grown plants can be drawn slightly outside their rect's cell
+
     def __init__(self, seeds_and_plants: list) -> None:
-        self.all_seeds_and_plants = seeds_and_plants
+        self.seeds = {}  # id -> seed, always in screen space
+        self.picked_up_plants = {}  # id -> plant sitting in an inventory slot
+        self.planted = SpatialHash()  # planted plants by world position
+        self.plant_field = PlantField()  # grows every planted plant near the camera at once
+        self.active_keys = set()  # cells near the camera, plants anywhere else catch up with advance_to
+        self.pending_adds = []
+        self.pending_removes = []
         self.dragged_seed = None
+        self.drawn_objects = []
+        self.frame = 0
+        for obj in seeds_and_plants:
+            self.add(obj)
+        self.apply_pending()
 
-    def draw(self, screen, camera) -> None:
-        for obj in self.all_seeds_and_plants:
-            if isinstance(obj, BasePlant):
-                obj.draw(screen, camera)
+    def add(self, obj) -> None:
+        """
+        Queues a seed or plant to be run from the end of this frame on
+        """
+        self.pending_adds.append(obj)
+
+    def remove(self, obj) -> None:
+        self.pending_removes.append(obj)
+
+    def apply_pending(self) -> None:
+        for obj in self.pending_removes:
+            if isinstance(obj, Seed):
+                self.seeds.pop(id(obj), None)
+                if obj is self.dragged_seed:
+                    self.dragged_seed = None
+            else:
+                self.picked_up_plants.pop(id(obj), None)
+                if obj in self.planted:
+                    self.planted.remove(obj)
+                if obj.field is not None:
+                    self.plant_field.remove(obj)
+        for obj in self.pending_adds:
+            if isinstance(obj, Seed):
+                self.seeds[id(obj)] = obj
             else:
-                obj.draw(screen)
+                self.update_membership(obj)
+        self.pending_removes = []
+        self.pending_adds = []
+
+    def update_membership(self, plant) -> None:
+        """
+        Keeps a plant in the field, spatial hash and inventory plants that match its state
+        """
+        if plant.picked_up:
+            if plant.field is not None:
+                self.plant_field.remove(plant)
+            if plant in self.planted:
+                self.planted.remove(plant)
+            self.picked_up_plants[id(plant)] = plant
+        else:
+            self.planted.move(plant, *plant.rect.center)
+            self.set_plant_active(plant, self.planted.object_keys[plant] in self.active_keys)
+
+    def set_plant_active(self, plant, active: bool) -> None:
+        if active and plant.field is None:
+            plant.advance_to(pygame.time.get_ticks() / 1000)
+            self.plant_field.add(plant)
+        elif not active and plant.field is not None:
+            self.plant_field.remove(plant)
+
+    def update_active_keys(self, view_rect) -> None:
+        """
+        Moves plants of cells that came near the camera into the field and drops the ones of cells that left
+        """
+        active_keys = set(self.planted.get_keys_in_rect(view_rect))
+        for key in self.active_keys ^ active_keys:
+            for plant in self.planted.cells.get(key, ()):
+                self.set_plant_active(plant, key in active_keys)
+        self.active_keys = active_keys
+
+    def get_visible_plants(self, camera) -> list:
+        view_rect = camera.get_world_rect(self.VIEW_MARGIN)
+        return [plant for plant in self.planted.query_rect(view_rect) if view_rect.colliderect(plant.rect)]
+
+    def draw(self, screen, camera) -> None:
+        visible_plants = self.get_visible_plants(camera)
+        for plant in visible_plants:
+            plant.draw(screen, camera)
+        for plant in self.picked_up_plants.values():
+            plant.draw(screen, camera)
+        for seed in self.seeds.values():
+            seed.draw(screen)
+        self.drawn_objects = visible_plants + list(self.picked_up_plants.values()) + list(self.seeds.values())
+
+    def get_screen_rects(self, camera) -> list:
+        return [obj.get_screen_rect(camera) for obj in self.drawn_objects]
+
+    def update_seed(self, seed, camera, tile_map) -> None:
+        seed.update(tile_map, camera)
+        if seed.placed:
+            new_pos = (pygame.mouse.get_pos()[0] + camera.offset.x,
+                       pygame.mouse.get_pos()[1] + camera.offset.y)
+            seed.plant_state.rect.center = new_pos
+            # growth starts on planting, the clock has been running since the seed was given or loaded
+            seed.plant_state.growing_clock = pygame.time.get_ticks() / 1000
+            self.remove(seed)
+            self.add(seed.plant_state)
+            return
+        # ensures there can only be one dragged seed at a time
+        if seed.dragged and (seed == self.dragged_seed or not self.dragged_seed): # can only be dragged seed if variable is available
+            self.dragged_seed = seed
+        else:
+            self.dragged_seed = None
+        seed.dragged = self.dragged_seed == seed
     
     def update(self, camera, tile_map) -> None:
-        for obj in self.all_seeds_and_plants:
-            if isinstance(obj, Seed):
-                obj.update(tile_map, camera)
-                if obj.placed:
-                    new_pos = (pygame.mouse.get_pos()[0] + camera.offset.x,
-                               pygame.mouse.get_pos()[1] + camera.offset.y)
-                    obj.plant_state.rect.center = new_pos
-                    self.all_seeds_and_plants.append(obj.plant_state)
-                    self.all_seeds_and_plants.remove(obj)
-                    break
-                # ensures there can only be one dragged seed at a time
-                if obj.dragged and (obj == self.dragged_seed or not self.dragged_seed): # can only be dragged seed if variable is available
-                    self.dragged_seed = obj
-                else:
-                    self.dragged_seed = None
-                obj.dragged = self.dragged_seed == obj
+        self.frame += 1
+        view_rect = camera.get_world_rect(self.VIEW_MARGIN)
+        self.update_active_keys(view_rect)
+        self.plant_field.step(pygame.time.get_ticks() / 1000)
 
-            else:
-                obj.update(camera)
+        for seed in self.seeds.values():
+            self.update_seed(seed, camera, tile_map)
+        for plant in self.picked_up_plants.values():
+            plant.update(camera)
+
+        # far away plants aren't in the field, their update catches their growth up in one go
+        for plant in self.planted.get_objects_to_update(view_rect, self.frame, self.FAR_UPDATE_INTERVAL):
+            plant.update(camera)
+            if plant.picked_up:
+                self.add(plant)  # moves it over to the inventory plants, picked up plants stop growing
+
+        self.apply_pending()
 
 def give_seed(player, plant_id, slot=None):
     # find empty slot if none provided
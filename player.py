@@ -1,11 +1,14 @@
 import pygame
 import items
 import json
+import math
 import os
-from dataclasses import dataclass, asdict, field
+from dataclasses import dataclass, asdict, field, fields
 from plants import NonFruitingPlant, Seed
 import pygame
 import ptext
+from world import MUD_ID
+from save_manager import SaveManager, TrackedDict
 
 @dataclass
 class PlayerData:
@@ -19,18 +22,56 @@ class PlayerData:
 
     def __post_init__(self):
         self.HEALTH_BAR_PATH = os.path.join('assets', 'images', 'healthbars')
+        self.inventory = TrackedDict(self.inventory)
+        self.inventory.on_change = self.mark_dirty
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in _PLAYER_DATA_FIELDS:
+            super().__setattr__('dirty', True)  # anything saved changed, see SaveManager
+
+    def mark_dirty(self):
+        """
+        For changes __setattr__ can't see, e.g. appending to illnesses
+        """
+        self.dirty = True
+
+    def get_health_bar_index(self) -> int:
+        """
+        0 for a full bar (health above 90) up to 10 for an empty one
+        """
+        return HEALTH_BAR_FRAMES - 1 - math.ceil(max(0, min(self.health, 100)) / 10)
 
     def get_health_bar_image(self):
-        for i in range(10, 0, -1):
-            if (i-1)*10 < self.health <= i*10:
-                reverse_i = 10 - i
-                if reverse_i < 10:
-                    return os.path.join(self.HEALTH_BAR_PATH, f'health0{reverse_i}.png')
-                return os.path.join(self.HEALTH_BAR_PATH, f'health{reverse_i}.png')
+        return os.path.join(self.HEALTH_BAR_PATH, f'health{self.get_health_bar_index():02}.png')
+
+
+_PLAYER_DATA_FIELDS = {f.name for f in fields(PlayerData)}
+
+HEALTH_BAR_FRAMES = 11  # health00.png (full) to health10.png (empty)
+HEALTH_BAR_FRAME_SIZE = (300, 200)  # after scaling to 200x300 and rotating
+_health_bar_atlas = None
+
+
+def get_health_bar_atlas() -> pygame.Surface:
+    """
+    Every health bar frame scaled, rotated and laid out left to right on one surface, built once
+    """
+    global _health_bar_atlas
+    if _health_bar_atlas is None:
+        frame_w, frame_h = HEALTH_BAR_FRAME_SIZE
+        _health_bar_atlas = pygame.Surface((frame_w * HEALTH_BAR_FRAMES, frame_h), pygame.SRCALPHA)
+        for idx in range(HEALTH_BAR_FRAMES):
+            path = os.path.join('assets', 'images', 'healthbars', f'health{idx:02}.png')
+            frame = pygame.transform.rotate(pygame.transform.scale(pygame.image.load(path), (200, 300)), 90)
+            _health_bar_atlas.blit(frame, (idx * frame_w, 0))
+        if pygame.display.get_surface():
+            _health_bar_atlas = _health_bar_atlas.convert_alpha()
+    return _health_bar_atlas
 
 
 class Player:
-    def __init__(self, pos: tuple) -> None:
+    def __init__(self, pos: tuple, save_interval: float = SaveManager.DEFAULT_INTERVAL, data_path: str = None) -> None:
         self.height = 120
         self.width = 75
         self.rect = pygame.Rect(pos[0], pos[1], self.width, self.height)
@@ -41,6 +82,7 @@ class Player:
         self.pos = pygame.math.Vector2(pos[0], pos[1])
         self.past_screen_size, self.screen_size = (1200, 700), (1200,700)
         self.INVENTORY_RECT_SIZE = 64
+        self.HEALTH_BAR_RECT = pygame.Rect(-7, -57, 300, 200)  # where the rotated health bar ends up on screen
         self.inventory_rects = [
             pygame.Rect(
                 (1200 - (8*64 + 7*20)) // 2 + i * (64 + 20),
@@ -49,23 +91,38 @@ class Player:
                 self.INVENTORY_RECT_SIZE
                 ) 
                 for i in range(8)]
-        self.player_data_path = os.path.join('gamedata', 'playerdata', 'player_data.json')
+        self.save_manager = SaveManager(data_path or os.path.join('gamedata', 'playerdata', 'player_data.json'), save_interval)
         self.data = self.get_player_data()
+        self.health_bar_atlas = get_health_bar_atlas()
+
+    @property
+    def player_data_path(self):
+        return self.save_manager.path
+
+    @player_data_path.setter
+    def player_data_path(self, path):
+        self.save_manager.path = path
 
     def get_player_data(self):
         if os.path.exists(self.player_data_path) and os.path.getsize(self.player_data_path) > 0:  # if path exists and actually has content in it
             with open(self.player_data_path, 'r') as ply_data:
-                    return PlayerData(**json.load(ply_data))  # function ends here if data successfully retrieved
+                player_data = PlayerData(**json.load(ply_data))
+            player_data.dirty = False  # nothing to save until something changes
+            return player_data  # function ends here if data successfully retrieved
         
-        with open(self.player_data_path, 'w') as ply_data:
-            player_data = PlayerData()
-            json.dump(asdict(player_data), ply_data, indent=4)
-
+        player_data = PlayerData()
+        SaveManager.write(self.player_data_path, asdict(player_data))
+        player_data.dirty = False
         return player_data
     
     def save_player_data(self):
-        with open(self.player_data_path, 'w') as f:
-            json.dump(asdict(self.data), f, indent=4)
+        """
+        Saves on the writer thread once the data changed and the save interval passed
+        """
+        self.save_manager.update(self.data)
+
+    def close(self):
+        self.save_manager.close(self.data)
 
     def update_inventory(self, screen):  
         # make sure inventory slots positions are proportional to screen size
@@ -81,21 +138,22 @@ class Player:
         for idx, rect in enumerate(self.inventory_rects):
             pygame.draw.rect(screen, 'black', rect)
 
+    def get_terrain(self, tile_map):
+        """
+        Properties of the tile under the player's feet
+        """
+        _, properties = tile_map.get_terrain_at(self.hitbox.center[0], self.hitbox.center[1])
+        return properties
+
     def get_if_in_water(self, tile_map) -> bool:
-        liquid_tiles = ['W']
-        return tile_map.get_tile_at(self.hitbox.center[0], self.hitbox.center[1]) in liquid_tiles
-    
+        return self.get_terrain(tile_map).is_liquid
+
     def get_if_in_mud(self, tile_map):
-        mud_tile = 'M'
-        return tile_map.get_tile_at(self.hitbox.center[0], self.hitbox.center[1]) == mud_tile
+        tile_id, _ = tile_map.get_terrain_at(self.hitbox.center[0], self.hitbox.center[1])
+        return tile_id == MUD_ID
 
     def get_speed_reducer(self, tile_map):
-        if self.get_if_in_water(tile_map):
-            return 0.3
-        elif self.get_if_in_mud(tile_map):
-            return 0.6
-        
-        return 1
+        return self.get_terrain(tile_map).speed_multiplier
 
     def move(self, tile_map) -> None:
         keys = pygame.key.get_pressed()
@@ -121,21 +179,15 @@ class Player:
 
     def draw_health_bar(self, screen, camera):
         # subtract 20 from x to display hp on player's left
-        health_bar_pos = (-7, -57)  
-        health_bar_image_path = self.data.get_health_bar_image()
-        health_bar_image = pygame.transform.rotate(
-            pygame.transform.scale(
-                pygame.image.load(health_bar_image_path)
-            , (200, 300)
-            )
-        , 90)
-
-        screen.blit(health_bar_image, health_bar_pos)
+        health_bar_pos = self.HEALTH_BAR_RECT.topleft
+        frame_w, frame_h = HEALTH_BAR_FRAME_SIZE
+        frame_area = (self.data.get_health_bar_index() * frame_w, 0, frame_w, frame_h)
+        screen.blit(self.health_bar_atlas, health_bar_pos, frame_area)
     
     def display_data(self, screen):
         coin_padding = 100
         coin_position = (screen.get_width()-(len(str(self.data.coins))*coin_padding), 10)
-        ptext.draw(f'Coins: {self.data.coins}', coin_position)
+        ptext.drawglyphs(f'Coins: {self.data.coins}', coin_position)
 
     def draw(self, screen: pygame.Surface, camera) -> None:
         screen_pos = (self.rect.x - camera.offset.x,
@@ -146,6 +198,12 @@ class Player:
         self.draw_health_bar(screen, camera)
         self.display_data(screen)
 
+    def get_screen_rects(self, camera) -> list[pygame.Rect]:
+        """
+        Everything draw and draw_inventory cover on screen, text is tracked by ptext itself
+        """
+        return [self.rect.move(-camera.offset.x, -camera.offset.y), self.HEALTH_BAR_RECT, *self.inventory_rects]
+
     def update(self, tile_map) -> None:
         self.rect.center = self.pos
         self.hitbox.bottomleft = self.rect.bottomleft
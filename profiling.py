@@ -0,0 +1,164 @@
+import time
+import cProfile
+from collections import defaultdict, deque
+from contextlib import nullcontext
+
+import numpy as np
+import pygame
+import ptext
+
+_NULL_SECTION = nullcontext()  # shared so a disabled profiler never allocates
+
+
+class _Section:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.frame_times[self.name] = (self.profiler.frame_times.get(self.name, 0)
+                                                + time.perf_counter() - self.start)
+
+
+class FrameProfiler:
+    """
+    Named timers around the subsystems of a frame, keeps the last `history` frames of each one
+    Usage:
+        profiler.begin_frame()
+        with profiler.section('tile_map.draw'):
+            tile_map.draw(screen, camera)
+        profiler.end_frame()
+    """
+    def __init__(self, enabled: bool = True, history: int = 600):
+        self.enabled = enabled
+        self.samples = defaultdict(lambda: deque(maxlen=history))  # name -> seconds per frame
+        self.frame_times = {}
+        self.frame_start = None
+        self.capture_profile = None  # cProfile.Profile while a capture is running
+        self.capture_frames_left = 0
+        self.capture_path = None
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_SECTION
+        return _Section(self, name)
+
+    def start_capture(self, frames: int, path: str) -> None:
+        """
+        Runs cProfile over the next `frames` frames and dumps the stats to `path`, readable with pstats or snakeviz
+        """
+        if self.capture_profile is not None:
+            return
+        self.capture_profile = cProfile.Profile()
+        self.capture_frames_left = frames
+        self.capture_path = path
+
+    def begin_frame(self) -> None:
+        if self.capture_profile is not None:
+            self.capture_profile.enable()
+        if self.enabled:
+            self.frame_times = {}
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self) -> None:
+        if self.capture_profile is not None:
+            self.capture_profile.disable()
+            self.capture_frames_left -= 1
+            if self.capture_frames_left <= 0:
+                self.capture_profile.dump_stats(self.capture_path)
+                self.capture_profile = None
+
+        if not self.enabled or self.frame_start is None:
+            return
+        self.frame_times['frame'] = time.perf_counter() - self.frame_start
+        for name, seconds in self.frame_times.items():
+            self.samples[name].append(seconds)
+
+    def get_percentiles(self, name, percentiles=(50, 99)) -> list[float]:
+        """
+        Returns the given percentiles of a timer in milliseconds
+        """
+        if not self.samples[name]:
+            return [0.0 for _ in percentiles]
+        return list(np.percentile(np.array(self.samples[name]) * 1000, percentiles))
+
+    def get_report(self) -> str:
+        lines = [f'{"subsystem":<22}{"p50 ms":>10}{"p99 ms":>10}']
+        for name in sorted(self.samples, key=lambda n: n != 'frame'):  # frame total first
+            p50, p99 = self.get_percentiles(name)
+            lines.append(f'{name:<22}{p50:>10.3f}{p99:>10.3f}')
+        return '\n'.join(lines)
+
+
+class ProfilerOverlay:
+    """
+    On screen frame budget overlay, F3 toggles it and F4 captures a cProfile of the next frames.
+    Shows a rolling graph of frame times against the 60 FPS budget and a per subsystem breakdown
+    """
+    TOGGLE_BUTTON = pygame.K_F3
+    CAPTURE_BUTTON = pygame.K_F4
+    CAPTURE_FRAMES = 300
+    CAPTURE_PATH = 'frame_profile.prof'
+    FRAME_BUDGET_MS = 1000 / 60
+    GRAPH_SIZE = (240, 80)
+    TEXT_REFRESH_FRAMES = 30  # breakdown text only changes this often so ptext isn't rendering new text every frame
+
+    def __init__(self, profiler: FrameProfiler, visible: bool = False):
+        self.profiler = profiler
+        self.visible = visible
+        self.always_profile = profiler.enabled  # otherwise timers only run while the overlay is showing
+        self.frames_since_refresh = self.TEXT_REFRESH_FRAMES
+        self.breakdown_text = ''
+        self.graph_rect = pygame.Rect(0, 0, *self.GRAPH_SIZE)
+        self.text_rect = pygame.Rect(0, 0, 0, 0)
+
+    def handle_event(self, event) -> None:
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == self.TOGGLE_BUTTON:
+            self.visible = not self.visible
+            self.profiler.enabled = self.visible or self.always_profile
+        elif event.key == self.CAPTURE_BUTTON:
+            self.profiler.start_capture(self.CAPTURE_FRAMES, self.CAPTURE_PATH)
+
+    def get_breakdown_text(self) -> str:
+        lines = []
+        for name in sorted(self.profiler.samples, key=lambda n: n != 'frame'):
+            recent = list(self.profiler.samples[name])[-self.TEXT_REFRESH_FRAMES:]
+            lines.append(f'{name}: {sum(recent) / len(recent) * 1000:.2f} ms')
+        return '\n'.join(lines)
+
+    def draw_graph(self, screen) -> None:
+        self.graph_rect.topright = (screen.get_width() - 10, 60)
+        pygame.draw.rect(screen, 'black', self.graph_rect)
+
+        max_ms = self.FRAME_BUDGET_MS * 2  # graph tops out at two frame budgets
+        frame_samples = list(self.profiler.samples['frame'])[-self.graph_rect.w:]
+        for idx, seconds in enumerate(frame_samples):
+            ms = seconds * 1000
+            bar_height = min(ms / max_ms, 1) * self.graph_rect.h
+            color = 'green' if ms <= self.FRAME_BUDGET_MS else 'red'
+            x = self.graph_rect.right - len(frame_samples) + idx
+            pygame.draw.line(screen, color, (x, self.graph_rect.bottom), (x, self.graph_rect.bottom - bar_height))
+
+        budget_y = self.graph_rect.bottom - self.FRAME_BUDGET_MS / max_ms * self.graph_rect.h
+        pygame.draw.line(screen, 'white', (self.graph_rect.left, budget_y), (self.graph_rect.right, budget_y))
+
+    def draw(self, screen) -> None:
+        if not self.visible:
+            return
+        self.frames_since_refresh += 1
+        if self.frames_since_refresh >= self.TEXT_REFRESH_FRAMES:
+            self.breakdown_text = self.get_breakdown_text()
+            self.frames_since_refresh = 0
+
+        self.draw_graph(screen)
+        text_surf, text_pos = ptext.draw(self.breakdown_text, topright=(self.graph_rect.right, self.graph_rect.bottom + 5),
+                                         fontsize=16, background=(0, 0, 0), align='right')
+        self.text_rect = pygame.Rect(text_pos, text_surf.get_size())
+
+    def get_screen_rects(self, camera) -> list[pygame.Rect]:
+        return [self.graph_rect, self.text_rect] if self.visible else []
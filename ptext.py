@@ -7,8 +7,10 @@
 
 from __future__ import division, print_function
 
+import re
 from math import ceil, sin, cos, radians, exp
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from bisect import bisect_right
 import pygame
 
 # Global default values
@@ -39,11 +41,78 @@ DEFAULT_ITALIC_TAG = None
 DEFAULT_COLOR_TAG = {}
 
 AUTO_CLEAN = True
+# When set to a list, draw appends the Rect of every Surface it blits, e.g. for dirty rect rendering.
+DRAWN_RECTS = None
 MEMORY_LIMIT_MB = 64
 MEMORY_REDUCTION_FACTOR = 0.5
+# Entry budgets of the smaller caches. The rendered surface cache is bounded by MEMORY_LIMIT_MB instead.
+FONT_CACHE_SIZE = 64
+FIT_CACHE_SIZE = 1024
+WIDTH_CACHE_SIZE = 4096
+GRADIENT_CACHE_SIZE = 256
+CIRCLE_CACHE_SIZE = 64
+UNROTATED_SIZE_CACHE_SIZE = 4096
+GLYPH_CACHE_SIZE = 1024
 
 pygame.font.init()
 
+# Least recently used cache with an optional entry and/or byte budget. Every cache in this module is
+# one of these, so they all evict in O(1) and report the same statistics, see cachestats.
+_caches = {}
+class _LRUCache(object):
+	def __init__(self, name, maxentries = None, maxbytes = None):
+		self.name = name
+		self.maxentries = maxentries
+		self.maxbytes = maxbytes
+		self.items = OrderedDict()  # key -> (value, size in bytes), least recently used first
+		self.bytes = 0
+		self.hits, self.misses, self.evictions = 0, 0, 0
+		_caches[name] = self
+	def __contains__(self, key):
+		return key in self.items
+	def __len__(self):
+		return len(self.items)
+	def get(self, key, default = None):
+		item = self.items.get(key)
+		if item is None:
+			self.misses += 1
+			return default
+		self.items.move_to_end(key)
+		self.hits += 1
+		return item[0]
+	def set(self, key, value, size = 0):
+		if key in self.items:
+			self.bytes -= self.items.pop(key)[1]
+		self.items[key] = value, size
+		self.bytes += size
+		self.shrink(self.maxbytes, self.maxentries)
+		return value
+	# Evicts least recently used entries until the cache is within the given budgets.
+	def shrink(self, maxbytes = None, maxentries = None):
+		while self.items and ((maxbytes is not None and self.bytes > maxbytes) or
+				(maxentries is not None and len(self.items) > maxentries)):
+			_, (_, size) = self.items.popitem(last = False)
+			self.bytes -= size
+			self.evictions += 1
+	def clear(self):
+		self.items.clear()
+		self.bytes = 0
+	def stats(self):
+		return {
+			"entries": len(self.items), "bytes": self.bytes,
+			"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+			"maxentries": self.maxentries, "maxbytes": self.maxbytes,
+		}
+
+# Hits, misses, evictions and size of every cache, by cache name. Useful for tuning MEMORY_LIMIT_MB
+# and the other cache budgets.
+def cachestats():
+	return { name: cache.stats() for name, cache in _caches.items() }
+
+def resetcachestats():
+	for cache in _caches.values():
+		cache.hits, cache.misses, cache.evictions = 0, 0, 0
+
 # Options objects encapsulate the keyword arguments to functions that take a lot of optional keyword
 # arguments.
 
@@ -356,11 +425,12 @@ class _FitsizeOptions(_Options):
 	def towrapoptions(self):
 		return self.getsuboptions(_WrapOptions)
 
-_font_cache = {}
+_font_cache = _LRUCache("font", maxentries = FONT_CACHE_SIZE)
 def getfont(**kwargs):
 	options = _GetfontOptions(**kwargs)
 	key = options.key()
-	if key in _font_cache: return _font_cache[key]
+	font = _font_cache.get(key)
+	if font is not None: return font
 	if options.sysfontname is not None:
 		font = pygame.font.SysFont(options.sysfontname, options.fontsize, options.bold or False, options.italic or False)
 	else:
@@ -374,8 +444,7 @@ def getfont(**kwargs):
 		font.set_italic(options.italic)
 	if options.underline is not None:
 		font.set_underline(options.underline)
-	_font_cache[key] = font
-	return font
+	return _font_cache.set(key, font)
 
 
 # Return the largest integer in the range [xmin, xmax] such that f(x) is True.
@@ -392,24 +461,23 @@ def _binarysearch(f, xmin = 1, xmax = 256):
 			xmax = x
 	return xmin
 
-_fit_cache = {}
+_fit_cache = _LRUCache("fit", maxentries = FIT_CACHE_SIZE)
 def _fitsize(text, size, **kwargs):
 	options = _FitsizeOptions(**kwargs)
 	key = text, size, options.key()
-	if key in _fit_cache: return _fit_cache[key]
+	fontsize = _fit_cache.get(key)
+	if fontsize is not None: return fontsize
 	width, height = size
 	def fits(fontsize):
 		opts = options.copy()
 		wmax, hmax = 0, 0
 		for span in _wrap(text, fontsize=fontsize, width=width, **opts.towrapoptions()):
 			y = span.font.get_linesize() * (opts.pspace * span.jpara + opts.lineheight * span.jline)
-			w, h = span.font.size(span.text)
+			h = _textsize(span.font, span.text)[1]
 			wmax = max(wmax, span.right)
 			hmax = max(hmax, y + h)
 		return wmax <= width and hmax <= height
-	fontsize = _binarysearch(fits)
-	_fit_cache[key] = fontsize
-	return fontsize
+	return _fit_cache.set(key, _binarysearch(fits))
 
 # Returns the color as a color RGB or RGBA tuple (i.e. 3 or 4 integers in the range 0-255)
 # If color is None, fall back to the default. If default is also None, return None.
@@ -443,13 +511,14 @@ def _resolveangle(angle):
 	return int(round(angle / ANGLE_RESOLUTION_DEGREES)) * ANGLE_RESOLUTION_DEGREES
 
 # Return the set of points in the circle radius r, using Bresenham's circle algorithm
-_circle_cache = {}
+_circle_cache = _LRUCache("circle", maxentries = CIRCLE_CACHE_SIZE)
 def _circlepoints(r):
 	r = int(round(r))
-	if r in _circle_cache:
-		return _circle_cache[r]
+	points = _circle_cache.get(r)
+	if points is not None:
+		return points
 	x, y, e = r, 0, 1 - r
-	_circle_cache[r] = points = []
+	points = _circle_cache.set(r, [])
 	while x >= y:
 		points.append((x, y))
 		y += 1
@@ -485,11 +554,12 @@ def _istransparent(color):
 	return len(color) > 3 and color[3] == 0
 
 # Produce a 1xh Surface with the given color gradient.
-_grad_cache = {}
+_grad_cache = _LRUCache("gradient", maxentries = GRADIENT_CACHE_SIZE)
 def _gradsurf(h, y0, y1, color0, color1):
 	key = h, y0, y1, color0, color1
-	if key in _grad_cache:
-		return _grad_cache[key]
+	surf = _grad_cache.get(key)
+	if surf is not None:
+		return surf
 	surf = pygame.Surface((1, h)).convert_alpha()
 	r0, g0, b0 = color0[:3]
 	r1, g1, b1 = color1[:3]
@@ -502,8 +572,7 @@ def _gradsurf(h, y0, y1, color0, color1):
 			int(round(g * b0 + f * b1)),
 			0
 		))
-	_grad_cache[key] = surf
-	return surf
+	return _grad_cache.set(key, surf, 4 * h)
 
 
 # Tracks everything that can be updated by tags.
@@ -594,7 +663,7 @@ class _Span:
 		self.right = self.x + self.width
 
 	def getwidth(self, text):
-		return self.font.size(text)[0]
+		return _textwidth(self.font, text)
 
 	def render(self):
 		if self.gcolor is None:
@@ -613,11 +682,210 @@ class _Span:
 			self.surf.blit(gsurf, (0, 0), None, pygame.BLEND_RGBA_ADD)
 
 
+# Text widths are measured a lot while wrapping, fitting and laying out the same strings over and
+# over, so measurements go through these caches.
+_width_cache = _LRUCache("width", maxentries = WIDTH_CACHE_SIZE)  # (font, text) -> font.size(text)
+_glyph_advances = _LRUCache("glyph_advances", maxentries = FONT_CACHE_SIZE)  # font -> {character: advance}
+
+# Exact size of text in font, kerning included. The height depends on the text, descenders and
+# brackets can reach below font.get_height().
+def _textsize(font, text):
+	key = font, text
+	size = _width_cache.get(key)
+	if size is None:
+		size = _width_cache.set(key, font.size(text))
+	return size
+
+def _textwidth(font, text):
+	return _textsize(font, text)[0]
+
+# Advance width of a single character in font, cached per font. Summed over a line this is close to
+# _textwidth, which also accounts for kerning.
+def _glyphadvance(font, c):
+	advances = _glyph_advances.get(font)
+	if advances is None:
+		advances = _glyph_advances.set(font, {})
+	if c not in advances:
+		metrics = font.metrics(c)[0] if c else None
+		advances[c] = font.size(c)[0] if metrics is None else metrics[4]
+	return advances[c]
+
+# Characters _breaktext has to substitute or remove, text without any of them takes the fast path.
+_SPECIAL_BREAK_CHARS = re.compile("[\u00A0\u2011\u200B\u00AD]")
+_BREAK_CHARS = re.compile("[ -]")
+
+# _breaktext for text without special characters: the printed text is the text itself and widths
+# only grow with every breakpoint. The last breakpoint that fits is found with an exponential then
+# binary search on exact widths, so only the breakpoints near the end of the line get read or measured.
+def _breaktext_plain(text, width, font, canbreakatstart):
+	if width is None:
+		return text, len(text)
+	matches = _BREAK_CHARS.finditer(text)
+	breaks = []
+
+	def hasbreak(k):
+		while len(breaks) <= k:
+			match = next(matches, None)
+			if match is None:
+				return False
+			breaks.append(match.end())
+		return True
+
+	def fits(k):
+		return _textwidth(font, text[:breaks[k]].rstrip(" ")) <= width
+
+	# Without a breakpoint to fall back on, the first one is taken however wide it is.
+	if not hasbreak(0) and not canbreakatstart:
+		return text, len(text)
+	lo = -1 if canbreakatstart else 0  # last breakpoint known to fit
+	hi = None  # first breakpoint known not to fit
+	# Guess from the average glyph advance how many characters fit, and start searching from the
+	# breakpoint before that
+	guess = int(width / _averageadvance(font))
+	k = lo
+	while hasbreak(k + 1) and breaks[k + 1] <= guess:
+		k += 1
+	if k > lo:
+		if fits(k):
+			lo = k
+		else:
+			hi = k
+	step = 1
+	while hi is None and hasbreak(lo + step) and fits(lo + step):
+		lo += step
+		step *= 2
+	if hi is None:
+		hi = lo + step if hasbreak(lo + step) else len(breaks)  # or the end of the text
+	while hi - lo > 1:
+		mid = (lo + hi) // 2
+		if fits(mid):
+			lo = mid
+		else:
+			hi = mid
+	if lo == len(breaks) - 1 and not hasbreak(lo + 1) and _textwidth(font, text) <= width:
+		return text, len(text)
+	b = breaks[lo] if lo >= 0 else 0
+	btext = text[:b]
+	# Take trailing spaces starting from the last valid breakpoint.
+	while b < len(text) and text[b] == " ":
+		b += 1
+		btext += " "
+	return btext, b
+
+# Average advance of common characters in font, for guessing how much text fits in a width.
+def _averageadvance(font):
+	advances = [_glyphadvance(font, c) for c in "etaoin shrdlu"]
+	return max(1, sum(advances) / len(advances))
+
+# How much wider than the line the advance estimate gets before _breaktext stops reading, to make
+# up for kerning.
+BREAK_ESTIMATE_SLACK = 1.25
+
 # Finds the last valid breakpoint in the line of text. A breakpoint is a position at which the line
 # can be split without improperly breaking words.
 # Returns (breaktext, breakpoint)
 def _breaktext(text, width, font, canbreakatstart = False):
-	# TODO: binary search
+	if not _SPECIAL_BREAK_CHARS.search(text):
+		return _breaktext_plain(text, width, font, canbreakatstart)
+	# The text to be printed that actually comes from text, with substitutions applied. Does not
+	# include stripped characters, e.g. soft hyphens, trailing or otherwise. Does include trailing spaces.
+	chars = []
+	length = 0
+	# Candidate breakpoints: (length of the printed text, index in text after the break, appended string)
+	breaks = []
+	# Estimated width of the line at each candidate, from glyph advances.
+	estimates = []
+	# Estimated width so far, and up to the last character that isn't a space.
+	estimate, trimmed = 0, 0
+	limit = None if width is None else width * BREAK_ESTIMATE_SLACK
+	complete = True
+	for j, c in enumerate(text):
+		atbreak, napp = False, ""
+		# Space and hyphen character allow for a breakpoint.
+		if c in [" ", "-"]:
+			atbreak = True
+		# Non-breaking space. No breakpoint here. Instead just add a space.
+		elif c == "\u00A0":
+			c = " "
+		# Non-breaking hyphen. No breakpoint here. Instead just add a hyphen.
+		elif c == "\u2011":
+			c = "-"
+		# Zero-width space. Allow a breakpoint but don't add anything (i.e. remove this character)
+		elif c == "\u200B":
+			atbreak = True
+			c = ""
+		# Soft hyphen. Allow a breakpoint with an appending string of hyphen ("-").
+		elif c == "\u00AD":
+			atbreak = True
+			c = ""
+			napp = "-"
+		chars.append(c)
+		length += len(c)
+		if c:
+			estimate += _glyphadvance(font, c)
+			if c != " ":
+				trimmed = estimate
+		if atbreak:
+			breaks.append((length, j + 1, napp))
+			estimates.append(trimmed + (_glyphadvance(font, napp) if napp else 0))
+		# Past the width (and then some), no later breakpoint can fit.
+		if limit is not None and estimate > limit and breaks:
+			complete = False
+			break
+	ptext = "".join(chars)
+
+	def isvalid(t):
+		return width is None or _textwidth(font, t) <= width
+
+	def breakline(k):
+		n, _, napp = breaks[k]
+		return (ptext[:n] + napp).rstrip(" ")
+
+	# Without a breakpoint to fall back on, the first one is taken however wide it is.
+	first = 0 if canbreakatstart else 1
+	if not breaks and not canbreakatstart:
+		return ptext, len(text)
+
+	# A soft hyphen adds a hyphen to its line, so one can fail even though longer lines fit.
+	# Like a full scan, stop at the first breakpoint that doesn't fit.
+	def firstbadhyphen(end):
+		for j in range(first, end):
+			if breaks[j][2] and not isvalid(breakline(j)):
+				return j
+		return None
+
+	# Otherwise widths only grow as the line gets longer, so if the whole line fits every breakpoint does.
+	if complete and isvalid(ptext) and firstbadhyphen(len(breaks)) is None:
+		return ptext, len(text)
+
+	# Start from the last breakpoint the estimate says fits and correct it with exact widths,
+	# only a few breakpoints around it get measured.
+	k = bisect_right(estimates, width, first) - 1 if width is not None else len(breaks) - 1
+	k = max(k, first - 1)
+	while k >= first and not isvalid(breakline(k)):
+		k -= 1
+	while k + 1 < len(breaks) and isvalid(breakline(k + 1)):
+		k += 1
+	if not complete and k == len(breaks) - 1:
+		# The estimate was off by more than the slack, the next breakpoint may fit too.
+		return _breaktext_scan(text, width, font, canbreakatstart)
+	badhyphen = firstbadhyphen(k + 1)
+	if badhyphen is not None:
+		k = badhyphen - 1
+
+	if k >= 0:
+		n, b, bapp = breaks[k]
+		btext = ptext[:n]
+	else:  # canbreakatstart, and no breakpoint fits
+		btext, b, bapp = "", 0, ""
+	# Invalid breakpoint found. Take trailing spaces starting from the last valid breakpoint.
+	while b < len(text) and text[b] == " ":
+		b += 1
+		bapp += " "
+	return btext + bapp, b
+
+# The original character by character scan, kept to check and benchmark _breaktext against.
+def _breaktext_scan(text, width, font, canbreakatstart = False):
 	# The text to be printed that actually comes from text. Does not include stripped characters,
 	# e.g. soft hyphens, trailing or otherwise. Does include trailing spaces.
 	btext = ""
@@ -669,6 +937,7 @@ def _breaktext(text, width, font, canbreakatstart = False):
 		bapp += " "
 	return btext + bapp, b
 
+
 # Split a single line of text.
 # textandtags is the output of _splitbytags, i.e. a sequence of (string, tag spec) tuples.
 def _wrapline(textandtags, width, getfontbytagspec):
@@ -734,19 +1003,14 @@ def _wrap(text, **kwargs):
 
 			
 
-_surf_cache = {}
-_surf_tick_usage = {}
-_surf_size_total = 0
-_unrotated_size = {}
-_tick = 0
+_surf_cache = _LRUCache("surf")  # bounded by MEMORY_LIMIT_MB, see clean
+_unrotated_size = _LRUCache("unrotated_size", maxentries = UNROTATED_SIZE_CACHE_SIZE)
 def getsurf(text, **kwargs):
-	global _tick, _surf_size_total
 	options = _GetsurfOptions(**kwargs)
 	key = text, options.key()
-	if key in _surf_cache:
-		_surf_tick_usage[key] = _tick
-		_tick += 1
-		return _surf_cache[key]
+	surf = _surf_cache.get(key)
+	if surf is not None:
+		return surf
 
 	if options.angle:
 		surf0 = getsurf(text, **options.update(angle = 0))
@@ -754,7 +1018,7 @@ def getsurf(text, **kwargs):
 		# draw() requires the unrotated size for proper positioning, but the unrotated surface will
 		# not necessarily be cached, so we add it to a global store here. In principle you could
 		# compute it from surf.get_size() and options.angle, were it not for rounding issues.
-		_unrotated_size[(surf.get_size(), options.angle, text)] = surf0.get_size()
+		_unrotated_size.set((surf.get_size(), options.angle, text), surf0.get_size())
 	elif options.alpha < 1.0:
 		surf = _fadesurf(getsurf(text, **options.update(alpha = 1.0)), options.alpha)
 	elif options._spx is not None:
@@ -831,10 +1095,7 @@ def getsurf(text, **kwargs):
 				surf.blit(span.surf, (x, span.y))
 	if options.cache:
 		w, h = surf.get_size()
-		_surf_size_total += 4 * w * h
-		_surf_cache[key] = surf
-		_surf_tick_usage[key] = _tick
-		_tick += 1
+		_surf_cache.set(key, surf, 4 * w * h)
 	return surf
 
 
@@ -846,7 +1107,7 @@ def _blitpos(angle, pos, anchor, size, text):
 	sw, sh = size
 	hanchor, vanchor = anchor
 	if angle:
-		w0, h0 = _unrotated_size[(size, angle, text)]
+		w0, h0 = _unrotated_size.get((size, angle, text))
 		S, C = sin(radians(angle)), cos(radians(angle))
 		dx, dy = (0.5 - hanchor) * w0, (0.5 - vanchor) * h0
 		x += dx * C + dy * S - 0.5 * sw
@@ -874,7 +1135,7 @@ def layout(text, **kwargs):
 	sw = max(span.linewidth for span in spans)
 	for span in spans:
 		y = int(round(span.jpara * parasize + span.jline * linesize))
-		rect = pygame.Rect(span.x, y, *font.size(span.text))
+		rect = pygame.Rect(span.x, y, *_textsize(font, span.text))
 		rect.x += int(round(options.align * (sw - span.linewidth)))
 		rects.append(rect)
 	sh = max(rect.bottom for rect in rects)
@@ -895,16 +1156,163 @@ def layout(text, **kwargs):
 	return [(span.text, rect, span.font) for span, rect in zip(spans, rects)]
 
 
+# Where getsurf puts the text itself on a surface with an outline or drop shadow, and how far the
+# outline or shadow reaches past it.
+def _decorationoffset(options):
+	if options._opx is not None:
+		return options._opx, options._opx, options._opx
+	if options._spx is not None:
+		sx, sy = options._spx
+		return max(abs(sx), abs(sy)), abs(sx) - max(sx, 0), abs(sy) - max(sy, 0)
+	return 0, 0, 0
+
+# The parts of rect outside of other, as up to four non-overlapping rects.
+def _subtractrect(rect, other):
+	clip = rect.clip(other)
+	if not clip.w or not clip.h:
+		return [rect] if rect.w and rect.h else []
+	pieces = [
+		pygame.Rect(rect.x, rect.y, rect.w, clip.top - rect.top),
+		pygame.Rect(rect.x, clip.bottom, rect.w, rect.bottom - clip.bottom),
+		pygame.Rect(rect.x, clip.y, clip.left - rect.left, clip.h),
+		pygame.Rect(clip.right, clip.y, rect.right - clip.right, clip.h),
+	]
+	return [piece for piece in pieces if piece.w > 0 and piece.h > 0]
+
+# Text that's revealed a few characters at a time, e.g. typewriter style dialogue. The whole text
+# is laid out and rendered once up front, drawing the first n characters then only blits the
+# visible part of each pre-rendered span, instead of rendering (and caching) every prefix.
+# Takes the same styling and anchor options as draw, the position is given to draw.
+class TypewriterLayout:
+	def __init__(self, text, **kwargs):
+		options = _DrawOptions(pos = (0, 0), **kwargs)
+		self.anchor = options.anchor
+		surfoptions = options.togetsurfoptions()
+		surfoptions["cache"] = False  # owned by this layout, keep it out of the shared cache
+		self.tsurf = getsurf(text, **surfoptions)
+		options = _GetsurfOptions(**surfoptions)
+		if options.angle:
+			raise ValueError("Nonzero angle not supported for ptext.TypewriterLayout")
+		pad, dx, dy = _decorationoffset(options)
+		# Same span placement as getsurf. Keeps the position of each span on tsurf and the
+		# width of every prefix of it.
+		spans = _wrap(text, **options.towrapoptions())
+		self.spans = []
+		if spans:
+			font = spans[0].font
+			w = max(span.linewidth for span in spans)
+			linesize = font.get_linesize() * options.lineheight
+			parasize = font.get_linesize() * options.pspace
+		start = 0
+		for span in spans:
+			x = int(round(span.x + options.align * (w - span.linewidth)))
+			y = int(round(span.jline * linesize + span.jpara * parasize))
+			found = text.find(span.text, start)
+			start = start if found == -1 else found
+			widths = [span.getwidth(span.text[:j]) for j in range(len(span.text) + 1)]
+			# as tall as getsurf renders the span, descenders and brackets can reach below both
+			# font.get_height() and font.size(text)
+			h = span.font.render(span.text, False, (0, 0, 0)).get_height()
+			rect = pygame.Rect(x + dx - pad, y + dy - pad, 0, h + 2 * pad)
+			self.spans.append((start, len(span.text), rect, [width + 2 * pad for width in widths]))
+			start += len(span.text)
+		self.length = len(text)
+
+	def getsize(self):
+		return self.tsurf.get_size()
+
+	def draw(self, count, pos, surf = None):
+		if surf is None:
+			surf = pygame.display.get_surface()
+		x0, y0 = _blitpos(0, pos, self.anchor, self.tsurf.get_size(), None)
+		if count >= self.length:
+			surf.blit(self.tsurf, (x0, y0))
+			if DRAWN_RECTS is not None:
+				DRAWN_RECTS.append(pygame.Rect((x0, y0), self.tsurf.get_size()))
+			return
+		drawn = []
+		for start, length, rect, widths in self.spans:
+			shown = min(count - start, length)
+			if shown <= 0:
+				break
+			area = pygame.Rect(rect.x, rect.y, widths[shown], rect.h).clip(self.tsurf.get_rect())
+			# An outline or shadow can reach into the next line, parts already blitted aren't blitted
+			# again, that would blend their edges twice.
+			pieces = [area]
+			for other in drawn:
+				pieces = [piece for area in pieces for piece in _subtractrect(area, other)]
+			for piece in pieces:
+				surf.blit(self.tsurf, (x0 + piece.x, y0 + piece.y), piece)
+			drawn.append(area)
+			if DRAWN_RECTS is not None:
+				DRAWN_RECTS.append(area.move(x0, y0))
+
+
 def draw(text, pos=None, **kwargs):
 	options = _DrawOptions(pos = pos, **kwargs)
 	tsurf = getsurf(text, **options.togetsurfoptions())
-	pos = _blitpos(options.angle, options.pos, options.anchor, tsurf.get_size(), text)
+	angle = _resolveangle(options.angle)
+	if angle and (tsurf.get_size(), angle, text) not in _unrotated_size:
+		# Evicted since the rotated surface was cached, the unrotated surface has the size we need.
+		surf0 = getsurf(text, **dict(options.togetsurfoptions(), angle = 0))
+		_unrotated_size.set((tsurf.get_size(), angle, text), surf0.get_size())
+	pos = _blitpos(angle, options.pos, options.anchor, tsurf.get_size(), text)
 	if options.surf is not None:
 		options.surf.blit(tsurf, pos)
+		if DRAWN_RECTS is not None:
+			DRAWN_RECTS.append(pygame.Rect(pos, tsurf.get_size()))
 	if AUTO_CLEAN:
 		clean()
 	return tsurf, pos
 
+# Glyph atlas rendering for short, frequently changing text like counters and prompts. Each
+# character is rendered once per style and cached, drawing composes the string from those glyphs,
+# so a counter that changes every frame doesn't render a new surface every frame.
+# Single line only, no wrapping, rotation or inline tags, and no kerning between glyphs.
+_glyph_cache = _LRUCache("glyphs", maxentries = GLYPH_CACHE_SIZE)
+def _getglyph(c, surfoptions, key):
+	glyph = _glyph_cache.get((c, key))
+	if glyph is not None:
+		return glyph
+	options = _GetsurfOptions(**surfoptions)
+	surf = getsurf(c, **surfoptions)
+	# A glyph's outline or shadow must not cover the glyph before it, so decorated glyphs also
+	# keep a plain copy that's blitted over the decorations of the whole string.
+	fill = None
+	if (options._opx is not None or options._spx is not None) and options.alpha == 1.0 and not _istransparent(options.color):
+		fill = getsurf(c, **dict(surfoptions, owidth = None, shadow = None, background = (0, 0, 0, 0)))
+	w, h = surf.get_size()
+	return _glyph_cache.set((c, key), (surf, fill), 4 * w * h)
+
+def drawglyphs(text, pos=None, **kwargs):
+	options = _DrawOptions(pos = pos, **kwargs)
+	if options.angle:
+		raise ValueError("Nonzero angle not supported for ptext.drawglyphs")
+	if "\n" in text:
+		raise ValueError("ptext.drawglyphs only draws a single line")
+	surfoptions = options.togetsurfoptions()
+	surfoptions.update(width = None, widthem = None, strip = False, cache = False,
+		underlinetag = None, boldtag = None, italictag = None, colortag = {})
+	goptions = _GetsurfOptions(**surfoptions)
+	key = goptions.key()
+	glyphs = [_getglyph(c, surfoptions, key) for c in text]
+	# Glyphs go where they'd be in the whole string, so they line up with ptext.draw. The font
+	# places glyphs at fractional, kerned positions that integer advances and prefix widths both
+	# miss, but the width of the text up to and including a glyph ends where that glyph ends.
+	font = getfont(**goptions.togetfontoptions())
+	xs = [_textwidth(font, text[:j + 1]) - _textwidth(font, c) for j, c in enumerate(text)]
+	w = max([0] + [gx + surf.get_width() for gx, (surf, _) in zip(xs, glyphs)])
+	h = glyphs[0][0].get_height() if glyphs else font.get_height()
+	x0, y0 = _blitpos(0, options.pos, options.anchor, (w, h), None)
+	rect = pygame.Rect(x0, y0, w, h)
+	if options.surf is not None:
+		_, dx, dy = _decorationoffset(goptions)
+		options.surf.blits([(surf, (x0 + gx, y0)) for gx, (surf, _) in zip(xs, glyphs)], False)
+		options.surf.blits([(fill, (x0 + gx + dx, y0 + dy)) for gx, (_, fill) in zip(xs, glyphs) if fill is not None], False)
+		if DRAWN_RECTS is not None:
+			DRAWN_RECTS.append(rect)
+	return rect
+
 def drawbox(text, rect, **kwargs):
 	options = _DrawboxOptions(**kwargs)
 	rect = pygame.Rect(rect)
@@ -915,17 +1323,8 @@ def drawbox(text, rect, **kwargs):
 	return draw(text, pos=(x,y), width=rect.width, fontsize=fontsize, **options.todrawoptions())
 
 def clean():
-	global _surf_size_total
 	memory_limit = MEMORY_LIMIT_MB * (1 << 20)
-	if _surf_size_total < memory_limit:
+	if _surf_cache.bytes < memory_limit:
 		return
-	memory_limit *= MEMORY_REDUCTION_FACTOR
-	keys = sorted(_surf_cache, key=_surf_tick_usage.get)
-	for key in keys:
-		w, h = _surf_cache[key].get_size()
-		del _surf_cache[key]
-		del _surf_tick_usage[key]
-		_surf_size_total -= 4 * w * h
-		if _surf_size_total < memory_limit:
-			break
+	_surf_cache.shrink(maxbytes = memory_limit * MEMORY_REDUCTION_FACTOR)
 
@@ -0,0 +1,103 @@
+import pygame
+import ptext
+
+
+class SnappedCamera:
+    """
+    Read-only copy of a camera with its offset rounded down to whole pixels,
+    so a scrolled background lines up exactly with newly drawn strips
+    """
+    def __init__(self, camera):
+        self.offset = pygame.Vector2(int(camera.offset.x), int(camera.offset.y))
+        self.w = camera.w
+        self.h = camera.h
+
+
+class DirtyRectRenderer:
+    """
+    Opt-in renderer that only pushes the parts of the screen that changed to the display.
+    The tile map is kept on its own background surface, when the camera moves the background
+    is shifted and only the strips that scrolled into view get drawn.
+    Sprites are erased each frame by copying the background back over where they were
+    """
+    def __init__(self):
+        self.background = None
+        self.last_offset = None
+        self.last_revision = None
+        self.last_rects = []
+        self.full_update = True
+
+    def get_exposed_strips(self, dx, dy, w, h) -> list[pygame.Rect]:
+        strips = []
+        if dx > 0:
+            strips.append(pygame.Rect(w - dx, 0, dx, h))
+        elif dx < 0:
+            strips.append(pygame.Rect(0, 0, -dx, h))
+        if dy > 0:
+            strips.append(pygame.Rect(0, h - dy, w, dy))
+        elif dy < 0:
+            strips.append(pygame.Rect(0, 0, w, -dy))
+        return strips
+
+    def update_background(self, screen, camera, tile_map) -> None:
+        snapped_camera = SnappedCamera(camera)
+        tile_map.update(snapped_camera)
+        w, h = screen.get_size()
+
+        needs_full_redraw = (self.background is None
+                             or self.background.get_size() != (w, h)
+                             or tile_map.revision != self.last_revision)
+
+        if not needs_full_redraw:
+            dx = int(snapped_camera.offset.x - self.last_offset.x)
+            dy = int(snapped_camera.offset.y - self.last_offset.y)
+            if abs(dx) >= w or abs(dy) >= h:
+                needs_full_redraw = True
+            elif dx or dy:
+                self.background.scroll(-dx, -dy)
+                for strip in self.get_exposed_strips(dx, dy, w, h):
+                    tile_map.draw_chunks(self.background, snapped_camera, strip)
+                self.full_update = True  # everything on screen moved
+
+        if needs_full_redraw:
+            if self.background is None or self.background.get_size() != (w, h):
+                self.background = pygame.Surface((w, h)).convert()
+            tile_map.draw_chunks(self.background, snapped_camera)
+            self.full_update = True
+
+        self.last_offset = snapped_camera.offset
+        self.last_revision = tile_map.revision
+
+    def begin_frame(self, screen, camera, tile_map) -> None:
+        """
+        Puts the tile map on screen and erases last frame's sprites, call instead of tile_map.draw
+        """
+        self.update_background(screen, camera, tile_map)
+
+        if self.full_update:
+            screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.last_rects:
+                screen.blit(self.background, rect, rect)
+
+        ptext.DRAWN_RECTS = []  # collect every piece of text drawn this frame
+
+    def end_frame(self, screen, camera, *sprite_groups) -> None:
+        """
+        Sends the changed rects to the display, call instead of pygame.display.update
+        :param sprite_groups : anything with get_screen_rects(camera), e.g. the player and runners
+        """
+        screen_rect = screen.get_rect()
+        rects = [rect.clip(screen_rect) for group in sprite_groups for rect in group.get_screen_rects(camera)]
+        rects += [rect.clip(screen_rect) for rect in ptext.DRAWN_RECTS]
+        rects = [rect for rect in rects if rect.w and rect.h]
+        ptext.DRAWN_RECTS = None
+
+        if self.full_update:
+            pygame.display.update()
+        else:
+            # last frame's rects have to be pushed too, they now show the erased background
+            pygame.display.update(self.last_rects + rects)
+
+        self.last_rects = rects
+        self.full_update = False
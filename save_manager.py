@@ -0,0 +1,96 @@
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict
+
+
+class TrackedDict(dict):
+    """
+    Dict that calls on_change whenever one of its items is set or removed
+    """
+    on_change = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if self.on_change:
+            self.on_change()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        if self.on_change:
+            self.on_change()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        if self.on_change:
+            self.on_change()
+        return value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        if self.on_change:
+            self.on_change()
+
+    def clear(self):
+        super().clear()
+        if self.on_change:
+            self.on_change()
+
+
+class SaveManager:
+    """
+    Write-behind saving for a dataclass with a `dirty` flag, e.g. PlayerData.
+    update() is cheap enough to call every frame, once the data is dirty and `interval` seconds
+    passed since the last save a snapshot is taken and written on a background thread.
+    Files are written to a temp file and renamed over the save, so a crash never leaves half a save behind
+    """
+    DEFAULT_INTERVAL = 2.0
+
+    def __init__(self, path: str, interval: float = DEFAULT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.last_save = time.monotonic()
+        self.pending = queue.Queue()  # (path, snapshot) to write, None stops the writer
+        self.writer = threading.Thread(target=self.run_writer, name='save-writer', daemon=True)
+        self.writer.start()
+
+    @staticmethod
+    def write(path: str, snapshot: dict) -> None:
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)  # atomic, readers see the old save or the new one
+
+    def run_writer(self) -> None:
+        while True:
+            job = self.pending.get()
+            if job is None:
+                return
+            self.write(*job)
+
+    def save(self, data) -> None:
+        """
+        Queues a snapshot of data right away, the writer thread does the rest
+        """
+        data.dirty = False
+        self.pending.put((self.path, asdict(data)))  # asdict deep copies, so the writer never sees later changes
+        self.last_save = time.monotonic()
+
+    def update(self, data) -> None:
+        if data.dirty and time.monotonic() - self.last_save >= self.interval:
+            self.save(data)
+
+    def close(self, data) -> None:
+        """
+        Saves anything that's left and waits for the writer to finish, call on shutdown
+        """
+        if not self.writer.is_alive():
+            return
+        if data.dirty:
+            self.save(data)
+        self.pending.put(None)
+        self.writer.join()
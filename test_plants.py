@@ -0,0 +1,66 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+import pygame
+from plants import BasePlant
+
+
+class AdvanceToTest(unittest.TestCase):
+    """
+    BasePlant.advance_to has to end up where calling grow() once per tick on schedule does
+    """
+    def setUp(self):
+        self.now = 0.0
+        patcher = mock.patch('pygame.time.get_ticks', lambda: self.now * 1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_plants(self, size, increments, max_size):
+        plants = []
+        for _ in range(2):
+            plant = BasePlant('test', (0, 0), 'red', size, 0, increments, None)
+            plant.growing_time = 1.0
+            plant.max_size = np.array(max_size, dtype=float)
+            plant.growing_clock = 0.0
+            plants.append(plant)
+        return plants
+
+    def grow_per_tick(self, plant, until):
+        while not isinstance(plant.growing_increments, int):
+            tick = plant.growing_clock + plant.growing_time
+            if tick > until:
+                break
+            self.now = tick + 1e-9
+            plant.grow()
+
+    def assert_same_growth(self, size, increments, max_size, until):
+        reference, plant = self.make_plants(size, increments, max_size)
+        self.grow_per_tick(reference, until)
+        plant.advance_to(until)
+        message = f'size {size} increments {increments} max {max_size} until {until}'
+        np.testing.assert_allclose(plant.size, reference.size, err_msg=message)
+        self.assertEqual(plant.times_grown, reference.times_grown, message)
+        self.assertEqual(isinstance(plant.growing_increments, int),
+                         isinstance(reference.growing_increments, int), message)
+
+    def test_matches_grow_per_tick(self):
+        rng = random.Random(1234)
+        for _ in range(800):
+            max_size = (rng.randint(10, 40), rng.randint(10, 40))
+            size = (rng.randint(5, max_size[0] + 2), rng.randint(5, max_size[1] + 2))
+            # binary fractions, so summing them tick by tick has no rounding error to disagree on
+            increments = (rng.choice([0.5, 1, 2, 3]), rng.choice([0.25, 0.75, 1, 2]))
+            self.assert_same_growth(size, increments, max_size, rng.uniform(0, 60))
+
+    def test_never_grows_when_first_tick_goes_over_max(self):
+        self.assert_same_growth((5, 14), (2, 3), (8, 15), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import unittest
+
+import pygame
+import ptext
+
+
+class DrawComparisonTest(unittest.TestCase):
+    """
+    Faster ways of drawing text have to put the same pixels on screen as ptext.draw
+    """
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        cls.screen = pygame.display.set_mode((1200, 700))
+
+    def snapshot(self, draw):
+        self.screen.fill((30, 90, 40))
+        draw()
+        return pygame.image.tobytes(self.screen, 'RGB')
+
+    def assert_same_pixels(self, draw, reference, message):
+        self.assertTrue(self.snapshot(draw) == self.snapshot(reference), message)
+
+    def test_typewriter_layout_fully_revealed(self):
+        texts = ['Hello there, want to trade? (5 coins)', 'jgy(q)', 'Hello there', 'ab cd',
+                 'a  b   c', 'line one\nline two is (longer)']
+        styles = [{}, {'owidth': 1.5, 'ocolor': 'black'}, {'shadow': (1, 1)}, {'fontsize': 23}, {'fontsize': 52}]
+        for text in texts:
+            for style in styles:
+                layout = ptext.TypewriterLayout(text, anchor=(0.5, 1.0), **style)
+                self.assert_same_pixels(lambda: layout.draw(len(text), (600, 400)),
+                                        lambda: ptext.draw(text, (600, 400), anchor=(0.5, 1.0), **style),
+                                        f'{text!r} {style}')
+
+    def test_typewriter_layout_spans(self):
+        # the trailing space is stripped, so revealing everything before it blits every span separately
+        texts = ['Hello there, want to trade? (5 coins) ', 'jgy(q) ', 'ab cd ', 'line one\nline two is (longer) ']
+        styles = [{}, {'owidth': 1.5, 'ocolor': 'black'}, {'shadow': (1, 1)}, {'fontsize': 23}, {'fontsize': 52}]
+        for text in texts:
+            for style in styles:
+                layout = ptext.TypewriterLayout(text, anchor=(0.5, 1.0), **style)
+                self.assert_same_pixels(lambda: layout.draw(len(text) - 1, (600, 400)),
+                                        lambda: ptext.draw(text, (600, 400), anchor=(0.5, 1.0), **style),
+                                        f'{text!r} {style}')
+
+    def test_drawglyphs_hud_text(self):
+        texts = ['Coins: 0', 'Coins: 12345', 'Coins: 9876543210', 'X to interact', 'Click on an item to trade']
+        for text in texts:
+            for style in [{}, {'fontsize': 23}, {'fontsize': 40}]:
+                self.assert_same_pixels(lambda: ptext.drawglyphs(text, (600, 400), anchor=(0.5, 1.0), **style),
+                                        lambda: ptext.draw(text, (600, 400), anchor=(0.5, 1.0), **style),
+                                        f'{text!r} {style}')
+
+    def test_drawglyphs_decorated_rect(self):
+        # overlapping outlines and shadows blend a little differently glyph by glyph, but the text
+        # has to end up in the same place
+        for style in [{'owidth': 1.5, 'ocolor': 'black'}, {'shadow': (1, 1)}]:
+            rect = ptext.drawglyphs('Coins: 12345', (600, 400), surf=None, **style)
+            tsurf, pos = ptext.draw('Coins: 12345', (600, 400), surf=None, **style)
+            self.assertEqual(rect, pygame.Rect(pos, tsurf.get_size()), style)
+
+
+class MeasurementTest(unittest.TestCase):
+    """
+    Cached measurements have to agree with what pygame measures for the same text
+    """
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        pygame.display.set_mode((1200, 700))
+
+    def test_fitsize_fits_measured_height(self):
+        for text in ['(5 coins)', 'jgy(q)', 'Hello']:
+            for height in range(12, 60, 3):
+                options = ptext._DrawboxOptions().tofitsizeoptions()
+                fontsize = ptext._fitsize(text, (400, height), **options)
+                font = ptext.getfont(fontsize=fontsize)
+                self.assertLessEqual(font.size(text)[1], height, f'{text!r} in {height} px at size {fontsize}')
+
+    def test_layout_rects_match_text_size(self):
+        font = ptext.getfont(fontsize=24)
+        for text in ['(5 coins)', 'jgy(q)', 'Hello']:
+            ((span_text, rect, _),) = ptext.layout(text, pos=(0, 0), fontsize=24, align=0, owidth=None, shadow=None)
+            self.assertEqual(rect.size, font.size(span_text), repr(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
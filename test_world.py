@@ -0,0 +1,139 @@
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import hashlib
+import sqlite3
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pygame
+from world import TileMap, Camera, ChunkStore
+
+# sha256 of the tile bytes (first 16 hex digits) and biome of a few chunks for world seed 1234.
+# If these change, saved worlds stop matching what the generator makes for the same seed
+GOLDEN_SEED = 1234
+GOLDEN_CHUNKS = {
+    (0, 0): ('Grassland', 'c0f508aecc0534b9'),
+    (1, 0): ('Grassland', 'e7ce3e44909e19bf'),
+    (0, 1): ('Grassland', '92ad46f03ed71510'),
+    (-3, 7): ('Wetland', 'e821b942940a34ec'),
+    (333, 333): ('Grassland', 'f4d283694d01bdea'),
+}
+
+
+def get_chunk_digest(chunk_key: tuple) -> tuple:
+    tile_map = TileMap(Camera(1200, 700, 1_000_000, 1_000_000), GOLDEN_SEED,
+                       generation_workers=1, chunk_store_path=':memory:')
+    tiles = tile_map.generate_chunk_array(*chunk_key)
+    biome = tile_map.get_biome_for_chunk(*chunk_key)
+    tile_map.close()
+    return biome, hashlib.sha256(tiles.tobytes()).hexdigest()[:16]
+
+
+class ChunkSeedingTest(unittest.TestCase):
+    """
+    Chunks have to come out the same for the same world seed, in this process and in worker processes
+    """
+    def test_golden_chunks(self):
+        for key, expected in GOLDEN_CHUNKS.items():
+            with self.subTest(chunk=key):
+                self.assertEqual(get_chunk_digest(key), expected)
+
+    def test_golden_chunks_in_worker_processes(self):
+        keys = list(GOLDEN_CHUNKS)
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            worker_digests = list(pool.map(get_chunk_digest, keys))
+        for key, digest in zip(keys, worker_digests):
+            with self.subTest(chunk=key):
+                self.assertEqual(digest, GOLDEN_CHUNKS[key])
+
+
+class ChunkStoreSeedTest(unittest.TestCase):
+    """
+    Stored chunks only come back for the world seed they were made with
+    """
+    CHUNK_SHAPE = (TileMap.CHUNK_HEIGHT, TileMap.CHUNK_WIDTH)
+
+    def setUp(self):
+        save_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(save_dir.cleanup)
+        self.save_dir = save_dir.name
+        self.path = os.path.join(self.save_dir, 'world.db')
+
+    def open_store(self, seed, unrecorded_seed=None) -> ChunkStore:
+        store = ChunkStore(self.path, self.CHUNK_SHAPE, seed, unrecorded_seed)
+        self.addCleanup(store.close)
+        return store
+
+    def save_chunk(self, seed) -> None:
+        store = self.open_store(seed)
+        store.save_chunks({(1, 2): np.full(self.CHUNK_SHAPE, 3, dtype=np.uint8)})
+        store.close()
+
+    def test_same_seed_keeps_chunks(self):
+        self.save_chunk(1234)
+        store = self.open_store(1234)
+        self.assertEqual(store.stored_keys, {(1, 2)})
+        self.assertEqual(int(store.get_chunks([(1, 2)])[(1, 2)][0, 0]), 3)
+
+    def test_other_seed_clears_chunks(self):
+        self.save_chunk(1234)
+        self.assertEqual(self.open_store(4321).stored_keys, set())
+        self.assertEqual(self.open_store(1234).stored_keys, set())
+
+    def test_database_without_seed(self):
+        for unrecorded_seed, expected in [(1234, {(1, 2)}), (4321, set()), (None, set())]:
+            with self.subTest(unrecorded_seed=unrecorded_seed):
+                self.path = os.path.join(self.save_dir, f'world-{unrecorded_seed}.db')
+                self.save_chunk(1234)
+                conn = sqlite3.connect(self.path)
+                conn.execute('DROP TABLE meta')
+                conn.commit()
+                conn.close()
+                self.assertEqual(self.open_store(1234, unrecorded_seed).stored_keys, expected)
+
+
+class DrawChunksTest(unittest.TestCase):
+    """
+    Every screen pixel draw_chunks fills has to be the colour of the tile under it
+    """
+    def setUp(self):
+        self.camera = Camera(1200, 700, 1_000_000, 1_000_000)
+        self.tile_map = TileMap(self.camera, GOLDEN_SEED, generation_workers=1, chunk_store_path=':memory:')
+        self.addCleanup(self.tile_map.close)
+
+    def get_expected_pixels(self, area: pygame.Rect) -> np.ndarray:
+        tile_size = self.tile_map.TILE_SIZE
+        cols = (np.arange(area.left, area.right) + int(self.camera.offset.x)) // tile_size
+        rows = (np.arange(area.top, area.bottom) + int(self.camera.offset.y)) // tile_size
+        unique_cols, col_idx = np.unique(cols, return_inverse=True)
+        unique_rows, row_idx = np.unique(rows, return_inverse=True)
+        tile_ids = np.array([[self.tile_map.get_tile_at(col * tile_size, row * tile_size) for row in unique_rows]
+                             for col in unique_cols])  # indexed [x, y] like surfarray
+        palette = np.array([color[:3] for color in self.tile_map.color_palette])
+        return palette[tile_ids[np.ix_(col_idx, row_idx)]]
+
+    def test_tiles_match_world(self):
+        areas = [pygame.Rect(0, 0, 1200, 700), pygame.Rect(1190, 0, 10, 700), pygame.Rect(0, 697, 1200, 3),
+                 pygame.Rect(250, 120, 333, 77)]
+        for offset in [(0, 0), (2950, 1950), (-37, 1234), (5999, -2001), (123456, 654321)]:
+            self.camera.offset = pygame.Vector2(offset)
+            for chunk_key in self.tile_map.get_chunks_in_rect(*offset, self.camera.w, self.camera.h):
+                self.tile_map.generate_chunk(*chunk_key)
+            for area in areas:
+                with self.subTest(offset=offset, area=area):
+                    screen = pygame.Surface((self.camera.w, self.camera.h))
+                    self.tile_map.draw_chunks(screen, self.camera, area)
+                    pixels = pygame.surfarray.array3d(screen)
+                    np.testing.assert_array_equal(pixels[area.left:area.right, area.top:area.bottom],
+                                                  self.get_expected_pixels(area))
+                    outside = pixels.copy()
+                    outside[area.left:area.right, area.top:area.bottom] = 0
+                    self.assertFalse(outside.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,38 @@ import pygame
 import os
 import random
 import json
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+import numpy as np
 from numpy import arange
 
+TILE_KEYS = ('W', 'M', 'DG', 'LG', 'S')  # tile id -> tile key, ids are the index
+TILE_IDS = {tile_key: tile_id for tile_id, tile_key in enumerate(TILE_KEYS)}
+WATER_ID, MUD_ID, DARK_GRASS_ID, LIGHT_GRASS_ID, SOIL_ID = range(len(TILE_KEYS))
+EMPTY_TILE_ID = 255  # marks out of bounds neighbors while generating
+
+
+@dataclass(frozen=True)
+class TileProperties:
+    speed_multiplier: float = 1
+    is_liquid: bool = False
+    can_plant: bool = False
+
+
+TILE_PROPERTIES = {  # tile id -> properties
+    WATER_ID: TileProperties(speed_multiplier=0.3, is_liquid=True),
+    MUD_ID: TileProperties(speed_multiplier=0.6),
+    DARK_GRASS_ID: TileProperties(),
+    LIGHT_GRASS_ID: TileProperties(),
+    SOIL_ID: TileProperties(can_plant=True),
+}
+PENDING_TILE_PROPERTIES = TileProperties()  # for tiles whose chunk is still being generated
+# indexed by tile id for batched queries, EMPTY_TILE_ID stands for pending tiles
+TILE_SPEED_MULTIPLIERS = np.array([TILE_PROPERTIES.get(tile_id, PENDING_TILE_PROPERTIES).speed_multiplier
+                                   for tile_id in range(256)])
+
 
 def get_biomes():
     """
@@ -47,15 +76,205 @@ class Camera:
         self.offset.x = max(0, min(self.offset.x, self.world_w - self.w))
         self.offset.y = max(0, min(self.offset.y, self.world_h - self.h))
 
+    def get_world_rect(self, margin: int = 0) -> pygame.Rect:
+        """
+        The part of the world the camera sees, grown by `margin` on every side
+        """
+        return pygame.Rect(self.offset.x - margin, self.offset.y - margin, self.w + margin * 2, self.h + margin * 2)
+
+class ChunkScheduler:
+    """
+    Generates chunks on worker threads so the render loop never waits on generation.
+    Chunks ahead of the camera get requested early, based on how fast the camera is moving
+    """
+    PREFETCH_FRAMES = 90  # how many frames of camera movement to look ahead
+    PREFETCH_MIN_DISTANCE = 1000  # always look at least this far ahead (px) while moving
+
+    def __init__(self, tile_map, workers: int = 2):
+        self.tile_map = tile_map
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chunk-gen')
+        self.pending = {}  # (chunk_x, chunk_y) -> future holding the generated tile array
+        self.last_offset = None
+
+    def request(self, chunk_x, chunk_y) -> None:
+        key = (chunk_x, chunk_y)
+        if key in self.pending or key in self.tile_map.loaded_chunks:
+            return
+        if self.tile_map.chunk_residency.restore(chunk_x, chunk_y):
+            return
+        self.pending[key] = self.executor.submit(self.tile_map.generate_chunk_array, chunk_x, chunk_y)
+
+    def get_pending(self, chunk_x, chunk_y) -> bool:
+        return (chunk_x, chunk_y) in self.pending
+
+    def collect_finished(self) -> None:
+        """
+        Moves every finished chunk into the tile map, never blocks
+        """
+        for key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[key]
+                if key not in self.tile_map.loaded_chunks:  # could have been generated on the spot meanwhile
+                    self.tile_map.add_chunk(*key, future.result())
+
+    def get_prefetch_chunks(self, camera) -> list[tuple]:
+        offset = camera.offset.copy()
+        velocity = offset - self.last_offset if self.last_offset is not None else pygame.Vector2()
+        self.last_offset = offset
+
+        if velocity.length() == 0:
+            return []
+        look_ahead = velocity.normalize() * max(velocity.length() * self.PREFETCH_FRAMES, self.PREFETCH_MIN_DISTANCE)
+        return self.tile_map.get_chunks_in_rect(offset.x + look_ahead.x, offset.y + look_ahead.y, camera.w, camera.h)
+
+    def prefetch(self, camera) -> None:
+        prefetch_chunks = self.get_prefetch_chunks(camera)
+        self.tile_map.chunk_residency.restore_many(prefetch_chunks)  # stored chunks come in one bulk read
+        for chunk_x, chunk_y in prefetch_chunks:
+            self.request(chunk_x, chunk_y)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ChunkStore:
+    """
+    SQLite table holding every chunk that has been saved, one row per chunk with its raw tile bytes.
+    Keys of stored chunks are kept in memory so checking for a chunk never touches the database.
+    The world seed the chunks were made with is stored next to them, opening the store with a different
+    seed clears them
+    """
+    def __init__(self, path: str, chunk_shape: tuple[int, int], seed, unrecorded_seed=None):
+        """
+        :param unrecorded_seed : seed the chunks of a database from before the seed was stored were made with
+        """
+        self.chunk_shape = chunk_shape
+        self.conn = sqlite3.connect(path)
+        self.cursor = self.conn.cursor()
+
+        self.cursor.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS chunks (
+                chunk_x INTEGER,
+                chunk_y INTEGER,
+                tiles BLOB,
+                PRIMARY KEY (chunk_x, chunk_y)
+            ) WITHOUT ROWID
+        '''
+                            )
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+        stored_seed = self.cursor.execute("SELECT value FROM meta WHERE key = 'seed'").fetchone()
+        stored_seed = stored_seed[0] if stored_seed else unrecorded_seed
+        if stored_seed != seed:
+            self.cursor.execute('DELETE FROM chunks')  # made for another world
+        self.cursor.execute("INSERT OR REPLACE INTO meta VALUES ('seed', ?)", (seed,))
+        self.conn.commit()
+        self.stored_keys = set(self.cursor.execute('SELECT chunk_x, chunk_y FROM chunks').fetchall())
+
+    def get_has_chunk(self, chunk_x, chunk_y) -> bool:
+        return (chunk_x, chunk_y) in self.stored_keys
+
+    def get_chunks(self, keys) -> dict:
+        """
+        Reads all the given chunks with one range query over their bounding box
+        """
+        keys = [key for key in keys if key in self.stored_keys]
+        if not keys:
+            return {}
+        xs, ys = [key[0] for key in keys], [key[1] for key in keys]
+        rows = self.cursor.execute(
+            'SELECT chunk_x, chunk_y, tiles FROM chunks WHERE chunk_x BETWEEN ? AND ? AND chunk_y BETWEEN ? AND ?',
+            (min(xs), max(xs), min(ys), max(ys))
+        ).fetchall()
+
+        wanted = set(keys)
+        return {
+            (chunk_x, chunk_y): np.frombuffer(tiles, dtype=np.uint8).reshape(self.chunk_shape).copy()
+            for chunk_x, chunk_y, tiles in rows
+            if (chunk_x, chunk_y) in wanted
+        }
+
+    def save_chunks(self, chunks: dict) -> None:
+        if not chunks:
+            return
+        self.cursor.executemany('INSERT OR REPLACE INTO chunks VALUES (?,?,?)',
+                                [(chunk_x, chunk_y, tiles.tobytes()) for (chunk_x, chunk_y), tiles in chunks.items()])
+        self.conn.commit()
+        self.stored_keys.update(chunks)
+
+    def close(self):
+        self.conn.close()
+
+
+class ChunkResidency:
+    """
+    Keeps only the chunks within `radius` chunks of the camera in memory.
+    Evicted chunks are written to the chunk store if it doesn't have them yet,
+    and read back from it when they're needed again
+    """
+    def __init__(self, tile_map, radius: int = 2):
+        self.tile_map = tile_map
+        self.radius = radius
+        self.unsaved_chunks = set()  # loaded chunks that are new or changed since they were last stored
+
+    def mark_unsaved(self, chunk_x, chunk_y) -> None:
+        self.unsaved_chunks.add((chunk_x, chunk_y))
+
+    def get_in_radius(self, key, center_key) -> bool:
+        return max(abs(key[0] - center_key[0]), abs(key[1] - center_key[1])) <= self.radius
+
+    def save_unsaved(self, keys=None) -> None:
+        keys = self.unsaved_chunks.copy() if keys is None else self.unsaved_chunks.intersection(keys)
+        self.tile_map.chunk_store.save_chunks({key: self.tile_map.loaded_chunks[key] for key in keys})
+        self.unsaved_chunks -= keys
+
+    def evict(self, keys) -> None:
+        self.save_unsaved(keys)
+        for key in keys:
+            del self.tile_map.loaded_chunks[key]
+
+    def restore(self, chunk_x, chunk_y) -> bool:
+        """
+        Reads a stored chunk back into the tile map, returns False if it was never stored
+        """
+        return bool(self.restore_many([(chunk_x, chunk_y)]))
+
+    def restore_many(self, keys) -> list[tuple]:
+        keys = [key for key in keys if key not in self.tile_map.loaded_chunks]
+        restored = self.tile_map.chunk_store.get_chunks(keys)
+        for (chunk_x, chunk_y), tile_ids in restored.items():
+            self.tile_map.add_chunk(chunk_x, chunk_y, tile_ids, saved=True)
+        return list(restored)
+
+    def update(self, camera) -> None:
+        center_key = self.tile_map.get_chunk_coords(camera.offset.x + camera.w / 2, camera.offset.y + camera.h / 2)
+        far_keys = [key for key in self.tile_map.loaded_chunks if not self.get_in_radius(key, center_key)]
+        if far_keys:
+            self.evict(far_keys)
+
+    def get_stats(self) -> dict:
+        chunk_bytes = sum(chunk.nbytes for chunk in self.tile_map.loaded_chunks.values())
+        return {
+            'resident_chunks': len(self.tile_map.loaded_chunks),
+            'chunk_bytes': chunk_bytes,
+            'stored_chunks': len(self.tile_map.chunk_store.stored_keys)
+        }
+
+
 class TileMap:
     CHUNK_WIDTH = 30
     CHUNK_HEIGHT = 20
     TILE_SIZE = 100
+    PLACEHOLDER_COLOR = pygame.Color('#1c5e26')  # drawn over chunks that are still generating
 
-    def __init__(self, camera: Camera, seed=None):
+    def __init__(self, camera: Camera, seed=None, generation_workers: int = 2, resident_radius: int = 2,
+                 chunk_store_path: str = None):
         self.WORLD_DATA_PATH = os.path.join('gamedata', 'world_data.json')
+        self.CHUNK_STORE_PATH = chunk_store_path or os.path.join('gamedata', 'world.db')
+        self.persistent = self.CHUNK_STORE_PATH != ':memory:'  # in-memory worlds (tools, tests) never touch the save files
         self.camera = camera
-        self.loaded_chunks = {}
+        self.loaded_chunks = {}  # (chunk_x, chunk_y) -> (CHUNK_HEIGHT, CHUNK_WIDTH) uint8 array of tile ids
+        self.revision = 0  # goes up whenever tiles are added or changed, so renderers know to redraw
         self.color_key = {
             'W': pygame.Color("#67c0d6"),  # WATER
             'M': pygame.Color("#443D31"), #MUD
@@ -63,8 +282,17 @@ class TileMap:
             'LG': pygame.Color('#2aaa3b'),  # LIGHT GRASS
             'S': pygame.Color('#96702b')  # SOIL
         }
-        self.seed = self.get_world_rng(seed)
-    
+        self.color_palette = [self.color_key[tile_key] for tile_key in TILE_KEYS]  # indexed by tile id
+        saved_seed = self.get_world_data().get('seed')
+        self.world_seed = seed if seed is not None else saved_seed
+        self.seed = self.get_world_rng(self.world_seed)
+        if self.world_seed != saved_seed and self.persistent:
+            # save the new seed right away, so a crash before close() doesn't bring the old world back
+            self.save_world_seed()
+        self.chunk_store = ChunkStore(self.CHUNK_STORE_PATH, (self.CHUNK_HEIGHT, self.CHUNK_WIDTH), self.world_seed,
+                                      unrecorded_seed=saved_seed)
+        self.chunk_scheduler = ChunkScheduler(self, generation_workers)
+        self.chunk_residency = ChunkResidency(self, resident_radius)
 
     def get_tile_neighbors(self, tile_map: list[list], row_index: int, col_index: int) -> list:
         neighbors = []
@@ -80,9 +308,16 @@ class TileMap:
     def get_chunk_coords(self, world_x, world_y):
         return world_x // (self.CHUNK_WIDTH * self.TILE_SIZE), world_y // (self.CHUNK_HEIGHT * self.TILE_SIZE)
     
+    def get_chunk_seed(self, chunk_x, chunk_y) -> int:
+        """
+        Mixes the world seed and chunk coords into a 64-bit seed. Unlike hash() this is
+        the same in every process and every run, so any worker can regenerate any chunk
+        """
+        chunk_key = f'{self.world_seed}:{int(chunk_x)}:{int(chunk_y)}'.encode()
+        return int.from_bytes(hashlib.blake2b(chunk_key, digest_size=8).digest(), 'little')
+
     def get_chunk_rng(self, chunk_x, chunk_y):
-        combined_seed = hash((self.seed, chunk_x, chunk_y))
-        return random.Random(combined_seed)
+        return random.Random(self.get_chunk_seed(chunk_x, chunk_y))
 
     def get_biome_for_chunk(self, chunk_x, chunk_y):
         rng = self.get_chunk_rng(chunk_x, chunk_y)
@@ -126,15 +361,28 @@ class TileMap:
         return new_tile_map
 
     def get_world_rng(self, chosen_seed):
-        if chosen_seed:
-            return random.Random(chosen_seed)
-        else:
-            seed = random.randint(0, 4_294_967_295) #seed range, over 4 billion seeds, 32-bit range
-            return random.Random(seed)
+        if chosen_seed is None:
+            chosen_seed = random.randint(0, 4_294_967_295) #seed range, over 4 billion seeds, 32-bit range
+            self.world_seed = chosen_seed
+        return random.Random(chosen_seed)
+
+    def get_world_data(self) -> dict:
+        if os.path.exists(self.WORLD_DATA_PATH) and os.path.getsize(self.WORLD_DATA_PATH) > 0:
+            with open(self.WORLD_DATA_PATH, 'r') as world_f:
+                return json.load(world_f)
+        return {}
+
+    def save_world_seed(self) -> None:
+        with open(self.WORLD_DATA_PATH, 'w') as world_f:
+            json.dump({'seed': self.world_seed}, world_f, indent=4)
 
     def save_world_data(self) -> None:
-        with open(self.WORLD_DATA_PATH, 'w') as world_f:
-            pass
+        """
+        Saves the world seed and writes every new or changed chunk to the chunk store
+        """
+        if self.persistent:
+            self.save_world_seed()
+        self.chunk_residency.save_unsaved()
 
     def drop_player(self, player, world_size: tuple):
         padding_between_edge = 0.2
@@ -145,18 +393,73 @@ class TileMap:
         selected_position = random.choice(list(x_range)), random.choice(list(y_range))
         player.pos = selected_position 
         
+    def get_base_terrain_chances(self, biome, rng) -> dict:
+        biome_data = get_biomes()[biome]
+        return {
+            tile: rng.uniform(*biome_data[tile])
+            for tile in self.color_key
+        }
+
+    def generate_chunk_array(self, chunk_x, chunk_y) -> np.ndarray:
+        """
+        Fills a whole chunk at once as a (CHUNK_HEIGHT, CHUNK_WIDTH) uint8 array of tile ids.
+        A tile becomes the least likely terrain whose chance is still above its random roll,
+        same as the per tile generator, then lone tiles get blended into one of their neighbors
+        """
+        rng = self.get_chunk_rng(chunk_x, chunk_y)
+        biome = self.get_biome_for_chunk(chunk_x, chunk_y)
+        base_terrain_chances = self.get_base_terrain_chances(biome, rng)
+        np_rng = np.random.default_rng(rng.getrandbits(64))  # seeded from the chunk rng so chunks stay deterministic
+
+        sorted_chances = sorted(base_terrain_chances.items(), key=lambda x: x[1])
+        thresholds = np.array([chance for _, chance in sorted_chances])
+        sorted_ids = np.array([TILE_IDS[tile] for tile, _ in sorted_chances], dtype=np.uint8)
+
+        rolls = np_rng.random((self.CHUNK_HEIGHT, self.CHUNK_WIDTH))
+        # the biggest chance is always >= 1 so every roll finds a terrain
+        tile_chunk = sorted_ids[np.searchsorted(thresholds, rolls, side='left')]
+
+        return self.blend_chunk_array(tile_chunk, np_rng)
+
+    def blend_chunk_array(self, tile_chunk: np.ndarray, np_rng) -> np.ndarray:
+        padded = np.pad(tile_chunk, 1, constant_values=EMPTY_TILE_ID)
+        neighbors = np.stack((
+            padded[:-2, 1:-1],  # up
+            padded[2:, 1:-1],  # down
+            padded[1:-1, :-2],  # left
+            padded[1:-1, 2:]  # right
+        ))
+        is_neighbor = neighbors != EMPTY_TILE_ID
+        same_neighbor_count = (neighbors == tile_chunk).sum(axis=0)
+
+        # pick a random real neighbor for every tile, only used where the tile is alone
+        neighbor_rolls = np.where(is_neighbor, np_rng.random(neighbors.shape), -1)
+        picked = np.take_along_axis(neighbors, neighbor_rolls.argmax(axis=0)[np.newaxis], axis=0)[0]
+
+        return np.where(same_neighbor_count == 0, picked, tile_chunk).astype(np.uint8)
+
+    def add_chunk(self, chunk_x, chunk_y, tile_ids: np.ndarray, saved: bool = False) -> np.ndarray:
+        self.loaded_chunks[(chunk_x, chunk_y)] = tile_ids
+        self.revision += 1
+        if not saved:
+            self.chunk_residency.mark_unsaved(chunk_x, chunk_y)
+        return tile_ids
+
     def generate_chunk(self, chunk_x, chunk_y):
+        """
+        Generates a chunk right away on the calling thread, the render loop goes through chunk_scheduler instead
+        """
+        return self.add_chunk(chunk_x, chunk_y, self.generate_chunk_array(chunk_x, chunk_y))
+
+    def generate_chunk_per_tile(self, chunk_x, chunk_y):
+        """
+        Original tile by tile generator, only kept to benchmark generate_chunk against
+        """
         rng = self.get_chunk_rng(chunk_x, chunk_y)
         biome = self.get_biome_for_chunk(chunk_x, chunk_y)
-        biome_data = get_biomes()[biome]
         tile_chunk = [[None for _ in range(self.CHUNK_WIDTH)]
                     for _ in range(self.CHUNK_HEIGHT)]
-        print('GENERATING NEW CHUNK')
-        print(biome)
-        base_terrain_chances = {
-            tile: rng.uniform(*biome_data[tile])
-            for tile in self.color_key
-        }
+        base_terrain_chances = self.get_base_terrain_chances(biome, rng)
 
 
         connect_terrain_chances = {
@@ -187,44 +490,205 @@ class TileMap:
                         tile_chunk[row_index][col_index] = tile_type
                         break
 
-        tile_chunk = self.blend_map(tile_chunk)
+        return self.blend_map(tile_chunk)
 
-        self.loaded_chunks[(chunk_x, chunk_y)] = tile_chunk
-            
-        return tile_chunk
 
+    def get_loaded_chunk(self, chunk_x, chunk_y):
+        """
+        Returns a chunk's tile ids, or None after asking for it to be generated
+        """
+        chunk = self.loaded_chunks.get((chunk_x, chunk_y))
+        if chunk is None:
+            self.chunk_scheduler.request(chunk_x, chunk_y)  # spilled chunks come back right away
+            chunk = self.loaded_chunks.get((chunk_x, chunk_y))
+        return chunk
 
     def get_tile_at(self, world_x, world_y):
-        chunk_x = world_x // (self.CHUNK_WIDTH * self.TILE_SIZE)
-        chunk_y = world_y // (self.CHUNK_HEIGHT * self.TILE_SIZE)
+        """
+        Returns the tile id at a world position, or None if its chunk is still being generated
+        """
+        chunk = self.get_loaded_chunk(*self.get_chunk_coords(world_x, world_y))
+        if chunk is None:
+            return None
+        local_x = (world_x % (self.CHUNK_WIDTH * self.TILE_SIZE)) // self.TILE_SIZE
+        local_y = (world_y % (self.CHUNK_HEIGHT * self.TILE_SIZE)) // self.TILE_SIZE
+        return int(chunk[int(local_y), int(local_x)])
+
+    def get_terrain_at(self, world_x, world_y) -> tuple:
+        """
+        Returns the tile id and its TileProperties from one lookup,
+        the tile id is None and the properties neutral while the chunk is still being generated
+        """
+        tile_id = self.get_tile_at(world_x, world_y)
+        if tile_id is None:
+            return None, PENDING_TILE_PROPERTIES
+        return tile_id, TILE_PROPERTIES[tile_id]
+
+    def get_terrain_at_points(self, points) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Batched get_terrain_at for many world positions, e.g. every NPC or seed at once.
+        Looks each chunk up once, returns arrays of tile ids (EMPTY_TILE_ID while pending) and speed multipliers
+        :param points : sequence or (n, 2) array of world x, y
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        chunk_w, chunk_h = self.CHUNK_WIDTH * self.TILE_SIZE, self.CHUNK_HEIGHT * self.TILE_SIZE
+        chunk_coords = np.floor_divide(points, (chunk_w, chunk_h)).astype(np.int64)
+        local_x = (points[:, 0] % chunk_w // self.TILE_SIZE).astype(np.intp)
+        local_y = (points[:, 1] % chunk_h // self.TILE_SIZE).astype(np.intp)
+
+        tile_ids = np.full(len(points), EMPTY_TILE_ID, dtype=np.uint8)
+        unique_coords, point_chunks = np.unique(chunk_coords, axis=0, return_inverse=True)
+        point_chunks = point_chunks.reshape(-1)
+        for idx, (chunk_x, chunk_y) in enumerate(unique_coords):
+            chunk = self.get_loaded_chunk(int(chunk_x), int(chunk_y))
+            if chunk is not None:
+                in_chunk = point_chunks == idx
+                tile_ids[in_chunk] = chunk[local_y[in_chunk], local_x[in_chunk]]
+        return tile_ids, TILE_SPEED_MULTIPLIERS[tile_ids]
+
+    def set_tile_at(self, world_x, world_y, tile_id: int) -> None:
+        chunk_x, chunk_y = self.get_chunk_coords(world_x, world_y)
         local_x = (world_x % (self.CHUNK_WIDTH * self.TILE_SIZE)) // self.TILE_SIZE
         local_y = (world_y % (self.CHUNK_HEIGHT * self.TILE_SIZE)) // self.TILE_SIZE
 
-        if (chunk_x, chunk_y) not in self.loaded_chunks:
+        if (chunk_x, chunk_y) not in self.loaded_chunks and not self.chunk_residency.restore(chunk_x, chunk_y):
             self.generate_chunk(chunk_x, chunk_y)
 
-        tile_key = self.loaded_chunks[(chunk_x, chunk_y)][int(local_y)][int(local_x)]
-        return tile_key
-    
+        self.loaded_chunks[(chunk_x, chunk_y)][int(local_y), int(local_x)] = tile_id
+        self.chunk_residency.mark_unsaved(chunk_x, chunk_y)
+        self.revision += 1
+
+    def draw_chunk_tiles(self, screen, chunk: np.ndarray, screen_pos, view: pygame.Rect) -> None:
+        """
+        Draws the tiles of a chunk that fall inside `view` (world coords relative to the chunk).
+        Only those tiles are scaled up, into an 8-bit surface with the tile palette
+        so tile ids are the pixel values
+        """
+        first_col = max(0, view.left // self.TILE_SIZE)
+        first_row = max(0, view.top // self.TILE_SIZE)
+        end_col = min(self.CHUNK_WIDTH, -(-view.right // self.TILE_SIZE))
+        end_row = min(self.CHUNK_HEIGHT, -(-view.bottom // self.TILE_SIZE))
+        if first_col >= end_col or first_row >= end_row:
+            return
+
+        # repeating the ids keeps every tile exactly TILE_SIZE wide, transform.scale can be off by a pixel or two
+        pixels = chunk[first_row:end_row, first_col:end_col].repeat(self.TILE_SIZE, 0).repeat(self.TILE_SIZE, 1)
+        tiles_surface = pygame.image.frombuffer(pixels, pixels.shape[::-1], 'P')
+        tiles_surface.set_palette(self.color_palette)
+        screen.blit(tiles_surface, (screen_pos[0] + first_col * self.TILE_SIZE, screen_pos[1] + first_row * self.TILE_SIZE))
+
+    def get_chunks_in_rect(self, x, y, w, h) -> list[tuple]:
+        start_chunk_x = int(x // (self.CHUNK_WIDTH * self.TILE_SIZE))
+        start_chunk_y = int(y // (self.CHUNK_HEIGHT * self.TILE_SIZE))
+        end_chunk_x = int((x + w) // (self.CHUNK_WIDTH * self.TILE_SIZE)) + 1
+        end_chunk_y = int((y + h) // (self.CHUNK_HEIGHT * self.TILE_SIZE)) + 1
+
+        return [(chunk_x, chunk_y)
+                for chunk_x in range(start_chunk_x, end_chunk_x)
+                for chunk_y in range(start_chunk_y, end_chunk_y)]
+
+    def close(self) -> None:
+        self.chunk_scheduler.shutdown()
+        self.save_world_data()
+        self.chunk_store.close()
+
+    def update(self, camera) -> None:
+        self.chunk_scheduler.collect_finished()
+        self.chunk_residency.update(camera)
+        self.chunk_scheduler.prefetch(camera)
+
+    def draw_chunks(self, screen, camera, area: pygame.Rect = None) -> None:
+        """
+        Draws the chunks under `area` (screen coords, defaults to the whole view), clipped to it
+        """
+        area = area or pygame.Rect(0, 0, camera.w, camera.h)
+        previous_clip = screen.get_clip()
+        screen.set_clip(area)
+
+        for chunk_x, chunk_y in self.get_chunks_in_rect(camera.offset.x + area.x, camera.offset.y + area.y, area.w, area.h):
+            screen_pos = (chunk_x * self.CHUNK_WIDTH * self.TILE_SIZE - camera.offset.x,
+                          chunk_y * self.CHUNK_HEIGHT * self.TILE_SIZE - camera.offset.y)
+
+            if (chunk_x, chunk_y) not in self.loaded_chunks:
+                self.chunk_scheduler.request(chunk_x, chunk_y)
+            if (chunk_x, chunk_y) not in self.loaded_chunks:
+                pygame.draw.rect(screen, self.PLACEHOLDER_COLOR,
+                                 (*screen_pos, self.CHUNK_WIDTH * self.TILE_SIZE, self.CHUNK_HEIGHT * self.TILE_SIZE))
+                continue
+
+            view = pygame.Rect(camera.offset.x + area.x - chunk_x * self.CHUNK_WIDTH * self.TILE_SIZE,
+                               camera.offset.y + area.y - chunk_y * self.CHUNK_HEIGHT * self.TILE_SIZE,
+                               area.w, area.h).inflate(2, 2)  # the camera offset can be fractional
+            self.draw_chunk_tiles(screen, self.loaded_chunks[(chunk_x, chunk_y)], screen_pos, view)
+
+        screen.set_clip(previous_clip)
+
     def draw(self, screen, camera):
-        start_chunk_x = int(camera.offset.x // (self.CHUNK_WIDTH * self.TILE_SIZE))
-        start_chunk_y = int(camera.offset.y // (self.CHUNK_HEIGHT * self.TILE_SIZE))
-        end_chunk_x = int((camera.offset.x + camera.w) // (self.CHUNK_WIDTH * self.TILE_SIZE)) + 1
-        end_chunk_y = int((camera.offset.y + camera.h) // (self.CHUNK_HEIGHT * self.TILE_SIZE)) + 1
-
-        for chunk_x in range(start_chunk_x, end_chunk_x):
-            for chunk_y in range(start_chunk_y, end_chunk_y):
-                if (chunk_x, chunk_y) not in self.loaded_chunks:
-                    self.generate_chunk(chunk_x, chunk_y)
-                chunk = self.loaded_chunks[(chunk_x, chunk_y)]
-
-                for row_idx, row in enumerate(chunk):
-                    for col_idx, tile in enumerate(row):
-                        
-                        tile_rect = pygame.Rect(
-                            chunk_x * self.CHUNK_WIDTH * self.TILE_SIZE + col_idx * self.TILE_SIZE - camera.offset.x,
-                            chunk_y * self.CHUNK_HEIGHT * self.TILE_SIZE + row_idx * self.TILE_SIZE - camera.offset.y,
-                            self.TILE_SIZE,
-                            self.TILE_SIZE
-                        )
-                        pygame.draw.rect(screen, self.color_key[tile], tile_rect)
+        self.update(camera)
+        self.draw_chunks(screen, camera)
+
+
+class SpatialHash:
+    """
+    Buckets objects into chunk sized cells keyed like TileMap.get_chunk_coords,
+    so finding what's near the camera only looks at the few cells it overlaps
+    """
+    def __init__(self, cell_width: int = TileMap.CHUNK_WIDTH * TileMap.TILE_SIZE,
+                 cell_height: int = TileMap.CHUNK_HEIGHT * TileMap.TILE_SIZE):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.cells = {}  # (cell_x, cell_y) -> set of objects
+        self.object_keys = {}  # object -> cell it is in
+
+    def __contains__(self, obj):
+        return obj in self.object_keys
+
+    def __len__(self):
+        return len(self.object_keys)
+
+    def get_key(self, x, y) -> tuple[int, int]:
+        return int(x // self.cell_width), int(y // self.cell_height)
+
+    def insert(self, obj, x, y) -> None:
+        key = self.get_key(x, y)
+        self.cells.setdefault(key, set()).add(obj)
+        self.object_keys[obj] = key
+
+    def remove(self, obj) -> None:
+        key = self.object_keys.pop(obj)
+        cell = self.cells[key]
+        cell.discard(obj)
+        if not cell:
+            del self.cells[key]
+
+    def move(self, obj, x, y) -> None:
+        if self.object_keys.get(obj) == self.get_key(x, y):
+            return
+        if obj in self.object_keys:
+            self.remove(obj)
+        self.insert(obj, x, y)
+
+    def get_keys_in_rect(self, rect: pygame.Rect) -> list[tuple]:
+        start_x, start_y = self.get_key(rect.left, rect.top)
+        end_x, end_y = self.get_key(rect.right, rect.bottom)
+        return [(cell_x, cell_y)
+                for cell_x in range(start_x, end_x + 1)
+                for cell_y in range(start_y, end_y + 1)
+                if (cell_x, cell_y) in self.cells]
+
+    def query_rect(self, rect: pygame.Rect) -> list:
+        return [obj for key in self.get_keys_in_rect(rect) for obj in self.cells[key]]
+
+    def get_objects_to_update(self, rect: pygame.Rect, frame: int, far_interval: int) -> list:
+        """
+        Objects whose rect overlaps rect are due every frame, everything else once every `far_interval` frames.
+        Far objects are batched per cell and staggered so the cells don't all land on the same frame
+        """
+        near_keys = set(self.get_keys_in_rect(rect))
+        due = []
+        for key, cell in self.cells.items():
+            if (frame + key[0] * 7 + key[1] * 13) % far_interval == 0:
+                due.extend(cell)
+            elif key in near_keys:
+                due.extend(obj for obj in cell if rect.colliderect(obj.rect))
+        return due